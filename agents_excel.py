@@ -1,15 +1,21 @@
 import pandas as pd
 import numpy as np
-import json
+import orjson
 import logging
 import hashlib
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple, Optional
+from typing import Callable, Dict, List, Tuple, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from autogen import AssistantAgent, UserProxyAgent, GroupChat, GroupChatManager
 import openpyxl
+import xlsxwriter
 from openpyxl.styles import Font, PatternFill
 import threading
+import time
+from collections import defaultdict
 import os
+from functools import lru_cache
+from types import MappingProxyType
 from dotenv import load_dotenv
 
 # Configure logging
@@ -19,68 +25,161 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
+@lru_cache(maxsize=1)
+def _api_key() -> Optional[str]:
+    return os.getenv("OPENAI_API_KEY")
+
 class Config:
     FRAUD_THRESHOLD = 0.7
     CONSENSUS_THRESHOLD = 3
-    HISTORY_FILE = "fraud_history.json"
+    MAX_WORKERS = 8
+    # Append-only JSONL: one score record per line, readable with read_json(lines=True)
+    HISTORY_FILE = "fraud_history.jsonl"
     OUTPUT_EXCEL_FORMAT = {
         'font': {'name': 'Arial', 'size': 11},
         'header': {'bold': True, 'bg_color': '#4472C4', 'font_color': 'white'}
     }
-    LLM_CONFIG = {
-        "config_list": [
-            {
+    # Read-only templates, frozen all the way down so no agent can mutate the
+    # shared config; agent_llm_config copies one into the plain dicts autogen accepts
+    LLM_CONFIG = MappingProxyType({
+        "config_list": (
+            MappingProxyType({
                 "model": "gpt-3.5-turbo",
-                "api_key": os.getenv("OPENAI_API_KEY")
-            }
-        ],
+                "api_key": _api_key()
+            }),
+        ),
         "temperature": 0.3,
         "timeout": 60
-    }
-    GPT4_CONFIG = {
-        "config_list": [
-            {
+    })
+    GPT4_CONFIG = MappingProxyType({
+        "config_list": (
+            MappingProxyType({
                 "model": "gpt-4",
-                "api_key": os.getenv("OPENAI_API_KEY")
-            }
-        ],
+                "api_key": _api_key()
+            }),
+        ),
         "temperature": 0.3,
         "timeout": 60
-    }
+    })
+
+    @staticmethod
+    def agent_llm_config(template: MappingProxyType) -> Dict:
+        """A mutable copy of a frozen LLM config, with config_list as a list of dicts"""
+        return {**template, "config_list": [dict(entry) for entry in template["config_list"]]}
 
 
 
 class MCPIntegration:
     def __init__(self):
         self.scores = {}
-        self.history = []
-        self.lock = threading.Lock()
+        # Running sum/max/fraud_count/n per claim, maintained by update_score
+        self.stats: Dict[str, Dict] = {}
+        self._history = []
+        # Each worker thread appends to its own buffer; flush_history merges them
+        self._tl = threading.local()
+        self._buffers: List[Tuple[threading.Thread, List[Dict]]] = []
+        # One lock per claim so concurrent claims never contend; the meta lock
+        # is only held long enough to create a claim's lock on first use
+        self.claim_locks: Dict[str, threading.Lock] = defaultdict(threading.Lock)
+        self._meta_lock = threading.Lock()
+        # Each record is appended without rewriting the file; the 64 KiB buffer
+        # amortizes the writes and is flushed with flush_history
+        self._history_fh = open(Config.HISTORY_FILE, 'ab', buffering=1 << 16)
         logger.info("MCP initialized")
 
+    def _claim_lock(self, claim_id: str) -> threading.Lock:
+        lock = self.claim_locks.get(claim_id)
+        if lock is None:
+            with self._meta_lock:
+                lock = self.claim_locks[claim_id]
+        return lock
+
+    def _history_buffer(self) -> List[Dict]:
+        buf = getattr(self._tl, 'buf', None)
+        if buf is None:
+            buf = self._tl.buf = []
+            with self._meta_lock:
+                self._buffers.append((threading.current_thread(), buf))
+        return buf
+
+    def flush_history(self) -> List[Dict]:
+        """Merge the per-thread history buffers into the shared history"""
+        with self._meta_lock:
+            for _, buf in self._buffers:
+                # Only drain what is there now; concurrent appends land past n
+                n = len(buf)
+                self._history.extend(buf[:n])
+                del buf[:n]
+            # Pool threads exit after each batch; forget their drained buffers
+            self._buffers = [(t, buf) for t, buf in self._buffers if t.is_alive() or buf]
+        self._history_fh.flush()
+        return self._history
+
+    def close(self):
+        self._history_fh.close()
+
+    @property
+    def history(self) -> List[Dict]:
+        return self.flush_history()
+
+    @staticmethod
+    def iso_timestamp(ts_ns: int) -> str:
+        return datetime.fromtimestamp(ts_ns / 1e9).isoformat()
+
+    @staticmethod
+    def serialize_record(record: Dict) -> Dict:
+        """Return a score/history record with its ts_ns rendered as ISO time"""
+        serialized = {k: v for k, v in record.items() if k != 'ts_ns'}
+        if 'ts_ns' in record:
+            serialized['timestamp'] = MCPIntegration.iso_timestamp(record['ts_ns'])
+        return serialized
+
     def update_score(self, claim_id: str, agent: str, score: float, metadata: Dict = None) -> bool:
         try:
             if not 0 <= score <= 1:
                 raise ValueError(f"Invalid score {score}. Must be between 0-1")
                 
-            timestamp = datetime.now().isoformat()
+            # Raw nanoseconds are cheap to take; serialize_record formats on output
+            ts_ns = time.time_ns()
             
-            with self.lock:
+            with self._claim_lock(claim_id):
                 if claim_id not in self.scores:
                     self.scores[claim_id] = {}
+                    self.stats[claim_id] = {'sum': 0.0, 'max': 0.0, 'fraud_count': 0, 'n': 0}
                 
-                self.scores[claim_id][agent] = {
+                claim_scores = self.scores[claim_id]
+                stats = self.stats[claim_id]
+                previous = claim_scores.get(agent)
+                
+                claim_scores[agent] = {
                     'score': score,
-                    'timestamp': timestamp,
+                    'ts_ns': ts_ns,
                     'metadata': metadata or {}
                 }
                 
-                self.history.append({
-                    'claim_id': claim_id,
-                    'agent': agent,
-                    'score': score,
-                    'timestamp': timestamp,
-                    'metadata': metadata
-                })
+                # Keep the consensus aggregates current so get_consensus is O(1)
+                if previous is None:
+                    stats['n'] += 1
+                else:
+                    stats['sum'] -= previous['score']
+                    stats['fraud_count'] -= previous['score'] >= Config.FRAUD_THRESHOLD
+                stats['sum'] += score
+                stats['fraud_count'] += score >= Config.FRAUD_THRESHOLD
+                if previous is not None and previous['score'] == stats['max'] and score < stats['max']:
+                    # The old maximum was replaced by something lower
+                    stats['max'] = max(v['score'] for v in claim_scores.values())
+                else:
+                    stats['max'] = max(stats['max'], score)
+            
+            record = {
+                'claim_id': claim_id,
+                'agent': agent,
+                'score': score,
+                'ts_ns': ts_ns,
+                'metadata': metadata
+            }
+            self._history_buffer().append(record)
+            self._history_fh.write(orjson.dumps(record, default=str) + b'\n')
                 
             return True
             
@@ -90,27 +189,24 @@ class MCPIntegration:
 
     def get_consensus(self, claim_id: str) -> Tuple[bool, Dict]:
         try:
-            with self.lock:
+            with self._claim_lock(claim_id):
                 if claim_id not in self.scores:
                     return False, {}
                 
-                scores_data = self.scores[claim_id]
-                simple_scores = {k: v['score'] for k, v in scores_data.items()}
-                
-                fraud_count = sum(1 for s in simple_scores.values() 
-                                if s >= Config.FRAUD_THRESHOLD)
-                has_consensus = fraud_count >= Config.CONSENSUS_THRESHOLD
-                
-                avg_score = sum(simple_scores.values()) / len(simple_scores) if simple_scores else 0
-                max_score = max(simple_scores.values()) if simple_scores else 0
-                
-                return has_consensus, {
-                    'scores': simple_scores,
-                    'average_score': round(avg_score, 2),
-                    'max_score': round(max_score, 2),
-                    'fraud_count': fraud_count,
-                    'agent_details': scores_data
-                }
+                scores_data = dict(self.scores[claim_id])
+                stats = dict(self.stats[claim_id])
+            
+            fraud_count = stats['fraud_count']
+            has_consensus = fraud_count >= Config.CONSENSUS_THRESHOLD
+            avg_score = stats['sum'] / stats['n'] if stats['n'] else 0
+            
+            return has_consensus, {
+                'scores': {k: v['score'] for k, v in scores_data.items()},
+                'average_score': round(avg_score, 2),
+                'max_score': round(stats['max'], 2),
+                'fraud_count': fraud_count,
+                'agent_details': {k: MCPIntegration.serialize_record(v) for k, v in scores_data.items()}
+            }
                 
         except Exception as e:
             logger.error(f"Consensus check failed: {e}")
@@ -128,6 +224,23 @@ class ExcelProcessor:
         'Location',
         'TransactionHashes'
     ]
+    # Free-text columns are read as strings up front instead of being inferred
+    COLUMN_DTYPES = {
+        col: 'string' for col in [
+            'ClaimID', 'Claimant', 'ClaimText', 'PolicyNumber', 'ContactEmail',
+            'SupportingDocs', 'MedicalCodes', 'Location', 'TransactionHashes'
+        ]
+    }
+    # pandas' openpyxl reader already streams the workbook read-only, values only
+    READ_KWARGS = {
+        'engine': 'openpyxl',
+        'dtype': COLUMN_DTYPES
+    }
+    RESULT_COLUMNS = [
+        'ClaimID', 'Claimant', 'OriginalClaim', 'Decision', 'ProcessingTime',
+        'ProcessingDurationSeconds', 'AverageScore', 'MaxScore', 'FraudVotes'
+    ]
+    MAX_COLUMN_WIDTH = 60
     
     @staticmethod
     def generate_template(output_path: str = "claims_template.xlsx"):
@@ -158,72 +271,118 @@ class ExcelProcessor:
         return output_path
 
     @staticmethod
-    def validate_input(file_path: str) -> bool:
+    def validate_input(file_path) -> Optional[pd.DataFrame]:
+        """Read and validate a claims workbook; returns None if it is unusable"""
         try:
-            df = pd.read_excel(file_path)
+            df = pd.read_excel(file_path, **ExcelProcessor.READ_KWARGS)
             missing = [col for col in ExcelProcessor.REQUIRED_COLUMNS if col not in df.columns]
             if missing:
                 raise ValueError(f"Missing required columns: {missing}")
-            return True
+            return df
         except Exception as e:
             logger.error(f"Excel validation failed: {e}")
-            return False
+            return None
 
     @staticmethod
-    def save_results(results: List[Dict], input_path: str) -> str:
-        output_path = input_path.replace('.xlsx', '_processed.xlsx')
-        
-        # Flatten the agent_scores structure for Excel output
-        processed_results = []
-        for result in results:
-            flat_result = {
-                'ClaimID': result.get('claim_id'),
-                'Claimant': result.get('claimant'),
-                'OriginalClaim': result.get('claim_text'),
-                'Decision': result.get('decision'),
-                'ProcessingTime': result.get('decision_timestamp'),
-                'ProcessingDurationSeconds': result.get('processing_time_seconds'),
-                'AverageScore': result.get('agent_scores', {}).get('average_score', 0),
-                'MaxScore': result.get('agent_scores', {}).get('max_score', 0),
-                'FraudVotes': result.get('agent_scores', {}).get('fraud_count', 0),
-                **result.get('metadata', {})
-            }
-            
-            # Add individual agent scores
-            for agent, score in result.get('agent_scores', {}).get('scores', {}).items():
-                flat_result[f'{agent}_score'] = score
-            
-            processed_results.append(flat_result)
-        
-        df = pd.DataFrame(processed_results)
+    def metadata_records(df: pd.DataFrame) -> List[Dict]:
+        """Convert each row into a dict of its non-missing cells"""
+        # The missing-cell mask and the column tuple are computed once for the
+        # whole frame; each row is then a flatnonzero plus a C-level zip
+        columns = tuple(df.columns)
+        mask = df.notna().to_numpy()
+        values = df.to_numpy(dtype=object)
+        records = []
+        for row_values, row_mask in zip(values, mask):
+            present = np.flatnonzero(row_mask)
+            records.append(dict(zip(map(columns.__getitem__, present), row_values[present])))
+        return records
+
+    @staticmethod
+    def results_path(input_path: str) -> str:
+        return input_path.replace('.xlsx', '_processed.xlsx')
+
+    @staticmethod
+    def flatten_result(result: Dict) -> Dict:
+        """Flatten the agent_scores structure of a claim report into one row"""
+        agent_scores = result.get('agent_scores', {})
+        flat_result = {
+            'ClaimID': result.get('claim_id'),
+            'Claimant': result.get('claimant'),
+            'OriginalClaim': result.get('claim_text'),
+            'Decision': result.get('decision'),
+            'ProcessingTime': result.get('decision_timestamp'),
+            'ProcessingDurationSeconds': result.get('processing_time_seconds'),
+            'AverageScore': agent_scores.get('average_score', 0),
+            'MaxScore': agent_scores.get('max_score', 0),
+            'FraudVotes': agent_scores.get('fraud_count', 0),
+            **result.get('metadata', {})
+        }
         
-        with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name='Results')
-            worksheet = writer.sheets['Results']
-            
-            # Format headers
-            for col in worksheet.iter_cols(1, len(df.columns)):
-                col[0].font = Font(bold=True, color="FFFFFF")
-                col[0].fill = PatternFill("solid", fgColor="4472C4")
-                
-            # Auto-adjust column widths
-            for column in worksheet.columns:
-                max_length = 0
-                column = [cell for cell in column]
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = (max_length + 2) * 1.2
-                worksheet.column_dimensions[column[0].column_letter].width = adjusted_width
+        # Add individual agent scores
+        for agent, score in agent_scores.get('scores', {}).items():
+            flat_result[f'{agent}_score'] = score
         
-        logger.info(f"Results saved to: {output_path}")
-        return output_path
+        return flat_result
+
+    @staticmethod
+    def column_width(header: str, values: pd.Series = None) -> int:
+        # Vectorized string lengths, capped so long free text stays readable
+        longest = values.astype(str).str.len().max() if values is not None and len(values) else 0
+        return min(ExcelProcessor.MAX_COLUMN_WIDTH, max(len(str(header)), longest) + 2)
+
+    @staticmethod
+    def result_widths(df: pd.DataFrame, agents: List[str]) -> Dict[str, int]:
+        """Results column layout and widths, known up front from the input sheet"""
+        sources = {'ClaimID': df.get('ClaimID'), 'Claimant': df.get('Claimant'), 'OriginalClaim': df.get('ClaimText')}
+        widths = {col: ExcelProcessor.column_width(col, sources.get(col)) for col in ExcelProcessor.RESULT_COLUMNS}
+        for col in df.columns:
+            if col not in widths:
+                widths[col] = ExcelProcessor.column_width(col, df[col])
+        for agent in agents:
+            widths[f'{agent}_score'] = ExcelProcessor.column_width(f'{agent}_score')
+        return widths
+
+    @staticmethod
+    def write_header(workbook, worksheet, widths: Dict[str, int]):
+        # constant_memory flushes a row as soon as the next one starts, so
+        # column widths and the header go first and rows are written in order
+        header_format = workbook.add_format(Config.OUTPUT_EXCEL_FORMAT['header'])
+        for i, (col, width) in enumerate(widths.items()):
+            worksheet.set_column(i, i, width)
+            worksheet.write(0, i, col, header_format)
+
+class ResultStreamWriter:
+    """Append claim results to a constant-memory results workbook as they finish"""
+
+    def __init__(self, output_path: str, widths: Dict[str, int]):
+        self.output_path = output_path
+        self.columns = list(widths)
+        self.rows_written = 0
+        self.workbook = xlsxwriter.Workbook(output_path, {'constant_memory': True})
+        self.worksheet = self.workbook.add_worksheet('Results')
+        ExcelProcessor.write_header(self.workbook, self.worksheet, widths)
+
+    def write(self, result: Dict):
+        flat_result = ExcelProcessor.flatten_result(result)
+        self.rows_written += 1
+        self.worksheet.write_row(self.rows_written, 0, [flat_result.get(col) for col in self.columns])
+
+    def close(self):
+        self.workbook.close()
+        logger.info(f"Results saved to: {self.output_path}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
 
 class CorgiAgentSystem:
     def __init__(self):
+        # Fail once at start-up rather than after building a group chat per row
+        if not _api_key():
+            raise ValueError("OPENAI_API_KEY is not set; the agent network cannot reach the LLM")
         self.mcp = MCPIntegration()
         self.agents = self._initialize_agents()
         self.agent_versions = {
@@ -253,7 +412,7 @@ class CorgiAgentSystem:
                     "geolocation_verification": bool,
                     "media_analysis": [...]
                 }""",
-                llm_config=Config.LLM_CONFIG
+                llm_config=Config.agent_llm_config(Config.LLM_CONFIG)
             ),
             "network": AssistantAgent(
                 name="NetworkThreatIntel",
@@ -268,7 +427,7 @@ class CorgiAgentSystem:
                     "suspicious_ips": [...],
                     "behavioral_anomalies": [...]
                 }""",
-                llm_config=Config.LLM_CONFIG
+                llm_config=Config.agent_llm_config(Config.LLM_CONFIG)
             ),
             "blockchain": AssistantAgent(
                 name="BlockchainForensics",
@@ -283,7 +442,7 @@ class CorgiAgentSystem:
                     "suspicious_transactions": [...],
                     "mixer_usage": bool
                 }""",
-                llm_config=Config.LLM_CONFIG
+                llm_config=Config.agent_llm_config(Config.LLM_CONFIG)
             ),
             "medical": AssistantAgent(
                 name="MedicalClaimsExpert",
@@ -298,7 +457,7 @@ class CorgiAgentSystem:
                     "treatment_anomalies": [...],
                     "provider_risk":0-1
                 }""",
-                llm_config=Config.LLM_CONFIG
+                llm_config=Config.agent_llm_config(Config.LLM_CONFIG)
             ),
             "geospatial": AssistantAgent(
                 name="GeospatialAnalyst",
@@ -313,7 +472,7 @@ class CorgiAgentSystem:
                     "weather_consistency":0-1,
                     "timestamp_analysis": {...}
                 }""",
-                llm_config=Config.LLM_CONFIG
+                llm_config=Config.agent_llm_config(Config.LLM_CONFIG)
             ),
             "decision": AssistantAgent(
                 name="DecisionEnginePro",
@@ -329,7 +488,7 @@ class CorgiAgentSystem:
                     "recommendations": [...],
                     "audit_required": bool
                 }""",
-                llm_config=Config.GPT4_CONFIG
+                llm_config=Config.agent_llm_config(Config.GPT4_CONFIG)
             )
         }
 
@@ -341,10 +500,8 @@ class CorgiAgentSystem:
                             context.get('claim_id'),
                             agent_name,
                             float(context.get('score', 0)),
-                            metadata={
-                                "analysis": context,
-                                "timestamp": datetime.now().isoformat()
-                            }
+                            # update_score stamps the record with ts_ns, which serialize_record formats
+                            metadata={"analysis": context}
                         )
                 except Exception as e:
                     logger.error(f"Handler error for {agent_name}: {e}")
@@ -365,7 +522,11 @@ class CorgiAgentSystem:
     def process_claim(self, claim_text: str, claimant: str, metadata: Dict = None) -> Dict:
         """Process a claim through the complete agent network"""
         metadata = metadata or {}
-        claim_id = metadata.get('ClaimID', hashlib.sha256(f"{claimant}{datetime.now().timestamp()}".encode()).hexdigest())
+        # Only hash when the row has no ClaimID of its own (dict.get would
+        # evaluate the default eagerly); blake2b is plenty for synthetic IDs
+        claim_id = metadata.get('ClaimID') or hashlib.blake2b(
+            f"{claimant}{datetime.now().timestamp()}".encode(), digest_size=16
+        ).hexdigest()
         
         try:
             groupchat = GroupChat(
@@ -377,7 +538,7 @@ class CorgiAgentSystem:
             
             manager = GroupChatManager(
                 groupchat=groupchat,
-                llm_config=Config.LLM_CONFIG
+                llm_config=Config.agent_llm_config(Config.LLM_CONFIG)
             )
             
             user_proxy = UserProxyAgent(
@@ -387,16 +548,17 @@ class CorgiAgentSystem:
                 default_auto_reply="Continue..."
             )
             
-            processing_start = datetime.now()
+            processing_start = time.perf_counter()
             user_proxy.initiate_chat(
                 manager,
-                message=json.dumps({
+                # Compact orjson output: the LLM gains nothing from indentation
+                message=orjson.dumps({
                     "action": "process_claim",
                     "claim_id": claim_id,
                     "claim_text": claim_text,
                     "claimant": claimant,
                     "metadata": metadata
-                }, indent=2)
+                }, option=orjson.OPT_SERIALIZE_NUMPY, default=str).decode()
             )
             
             is_fraud, agent_scores = self.mcp.get_consensus(claim_id)
@@ -408,7 +570,7 @@ class CorgiAgentSystem:
                 "claim_text": claim_text,
                 "decision": "REJECT" if is_fraud else "APPROVE",
                 "decision_timestamp": datetime.now().isoformat(),
-                "processing_time_seconds": round((datetime.now() - processing_start).total_seconds(), 2),
+                "processing_time_seconds": round(time.perf_counter() - processing_start, 2),
                 "agent_scores": agent_scores,
                 "agent_versions": self.agent_versions,
                 "metadata": metadata
@@ -428,26 +590,52 @@ class CorgiAgentSystem:
                 "metadata": metadata
             }
 
-    def process_excel(self, file_path: str) -> str:
-        """Batch process claims from Excel file"""
+    def process_excel(self, file_path, max_workers: int = None,
+                      progress_cb: Optional[Callable[[int, str], None]] = None,
+                      output_path: Optional[str] = None) -> str:
+        """Batch process claims from an Excel path or buffer, reporting (percent, message) to progress_cb
+
+        Results go to output_path, which defaults to a _processed.xlsx beside
+        file_path and is required when file_path is a buffer.
+        """
+        if output_path is None and not isinstance(file_path, str):
+            raise ValueError("output_path is required when processing an Excel buffer")
         try:
-            if not ExcelProcessor.validate_input(file_path):
+            # validate_input hands back the frame it parsed, so the file is read once
+            df = ExcelProcessor.validate_input(file_path)
+            if df is None:
                 raise ValueError("Invalid Excel file structure")
             
-            df = pd.read_excel(file_path)
-            results = []
+            metadata_rows = ExcelProcessor.metadata_records(df)
+            agents = [name for name in self.agents if name != "decision"]
+            output_path = output_path or ExcelProcessor.results_path(file_path)
             
-            for _, row in df.iterrows():
-                metadata = {col: row[col] for col in df.columns if pd.notna(row[col])}
-                result = self.process_claim(
-                    claim_text=row['ClaimText'],
-                    claimant=row['Claimant'],
-                    metadata=metadata
-                )
-                results.append(result)
+            # Claims are I/O-bound on the LLM group chat, so fan them out over a
+            # bounded pool; each process_claim builds its own GroupChat/Manager.
+            # Rows are streamed to disk in completion order so memory stays flat
+            # and finished claims are kept even if the batch fails part way.
+            with ResultStreamWriter(output_path, ExcelProcessor.result_widths(df, agents)) as stream, \
+                    ThreadPoolExecutor(max_workers=max_workers or Config.MAX_WORKERS) as executor:
+                futures = [
+                    executor.submit(
+                        self.process_claim,
+                        claim_text=metadata.get('ClaimText'),
+                        claimant=metadata.get('Claimant'),
+                        metadata=metadata
+                    )
+                    for metadata in metadata_rows
+                ]
+                
+                total, last_pct = len(futures), -1
+                for done, future in enumerate(as_completed(futures), 1):
+                    stream.write(future.result())
+                    pct = done * 100 // total
+                    if progress_cb and pct != last_pct:
+                        progress_cb(pct, f"Processed {done}/{total} claims")
+                        last_pct = pct
             
-            output_path = ExcelProcessor.save_results(results, file_path)
-            logger.info(f"Processed {len(results)} claims successfully")
+            self.mcp.flush_history()
+            logger.info(f"Processed {stream.rows_written} claims successfully")
             return output_path
             
         except Exception as e:
@@ -0,0 +1,123 @@
+"""Batch task state for the API: in-process by default, Redis when REDIS_URL is set"""
+from typing import AsyncIterator, Dict, Optional, Tuple
+import orjson
+from cachetools import TTLCache
+
+TASK_TTL = 86400  # Seconds a batch task is kept after its last write
+TASK_PREFIX = "task:"  # Redis hash key per batch task
+CHANNEL_PREFIX = "ws:"  # Redis pub/sub channel per batch task's WebSocket updates
+DIGEST_PREFIX = "digest:"  # Redis key from a processed upload's content digest to its task
+
+def encode_fields(fields: Dict) -> Dict[str, bytes]:
+    """orjson-encode each value for storage as a Redis hash field"""
+    return {k: orjson.dumps(v, default=str) for k, v in fields.items()}
+
+class MemoryBatchStore:
+    """Per-process task store; only consistent with a single uvicorn worker"""
+
+    def __init__(self, maxsize: int = 10_000, ttl: int = TASK_TTL):
+        self._tasks = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._digests = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def get(self, task_id: str) -> Optional[Dict]:
+        task = self._tasks.get(task_id)
+        return dict(task) if task is not None else None
+
+    async def set(self, task_id: str, task: Dict):
+        self._tasks[task_id] = dict(task)
+
+    async def reserve(self, task_id: str, task: Dict) -> bool:
+        """Store task only if task_id is unused; False when it is already taken"""
+        if task_id in self._tasks:
+            return False
+        self._tasks[task_id] = dict(task)
+        return True
+
+    async def update(self, task_id: str, **fields):
+        task = self._tasks.get(task_id)
+        if task is None:
+            self._tasks[task_id] = dict(fields)
+        else:
+            task.update(fields)
+            self._tasks[task_id] = task  # Reassigned so TTLCache restarts the task's TTL
+
+    async def delete(self, task_id: str):
+        self._tasks.pop(task_id, None)
+
+    async def get_digest_task(self, digest: str) -> Optional[str]:
+        """The task that processed an upload with this content digest, if recorded"""
+        return self._digests.get(digest)
+
+    async def set_digest_task(self, digest: str, task_id: str):
+        self._digests[digest] = task_id
+
+    async def items(self) -> AsyncIterator[Tuple[str, Dict]]:
+        for task_id, task in list(self._tasks.items()):
+            yield task_id, dict(task)
+
+    async def close(self):
+        pass
+
+class RedisBatchStore:
+    """Task store shared by every worker, kept as one Redis hash per task
+
+    Each field holds an orjson-encoded value, so a progress tick rewrites only
+    the progress field rather than the whole task.
+    """
+
+    def __init__(self, client, ttl: int = TASK_TTL, prefix: str = TASK_PREFIX):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.digest_prefix = DIGEST_PREFIX
+
+    async def get(self, task_id: str) -> Optional[Dict]:
+        raw = await self.client.hgetall(self.prefix + task_id)
+        if not raw:
+            return None
+        return {(k.decode() if isinstance(k, bytes) else k): orjson.loads(v) for k, v in raw.items()}
+
+    async def set(self, task_id: str, task: Dict):
+        key = self.prefix + task_id
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.delete(key)
+            pipe.hset(key, mapping=encode_fields(task))
+            pipe.expire(key, self.ttl)
+            await pipe.execute()
+
+    async def reserve(self, task_id: str, task: Dict) -> bool:
+        """Store task only if task_id is unused; False when it is already taken"""
+        # HSETNX on the first field claims the hash atomically; the rest follow
+        field, value = next(iter(encode_fields(task).items()))
+        if not await self.client.hsetnx(self.prefix + task_id, field, value):
+            return False
+        await self.update(task_id, **task)
+        return True
+
+    async def update(self, task_id: str, **fields):
+        key = self.prefix + task_id
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.hset(key, mapping=encode_fields(fields))
+            pipe.expire(key, self.ttl)
+            await pipe.execute()
+
+    async def delete(self, task_id: str):
+        await self.client.delete(self.prefix + task_id)
+
+    async def get_digest_task(self, digest: str) -> Optional[str]:
+        """The task that processed an upload with this content digest, if recorded"""
+        task_id = await self.client.get(self.digest_prefix + digest)
+        return task_id.decode() if isinstance(task_id, bytes) else task_id
+
+    async def set_digest_task(self, digest: str, task_id: str):
+        await self.client.set(self.digest_prefix + digest, task_id, ex=self.ttl)
+
+    async def items(self) -> AsyncIterator[Tuple[str, Dict]]:
+        async for key in self.client.scan_iter(match=self.prefix + "*"):
+            key = key.decode() if isinstance(key, bytes) else key
+            task = await self.get(key[len(self.prefix):])
+            if task is not None:
+                yield key[len(self.prefix):], task
+
+    async def close(self):
+        await self.client.aclose()
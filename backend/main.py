@@ -1,18 +1,31 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks, WebSocket, WebSocketDisconnect, Query, Request, Response, Header
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, JSONResponse
-from pydantic import BaseModel
-from typing import Dict, List, Optional
-import pandas as pd
-import json
+from starlette.exceptions import HTTPException as StarletteHTTPException
+from starlette.background import BackgroundTask
+from fastapi.responses import FileResponse, ORJSONResponse
+from pydantic import BaseModel, ConfigDict
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
+from functools import lru_cache
+from pathlib import PurePosixPath
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from cachetools import TTLCache
+from openpyxl import load_workbook
+import orjson
+import hashlib
+import io
 import os
+import shutil
+import tempfile
 import sys
 import uuid
 from datetime import datetime
 import logging
 from dotenv import load_dotenv
 import asyncio
+import aiofiles
+import aiofiles.os
 import time
 
 # Load environment variables first
@@ -23,44 +36,143 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
 
 try:
-    from agents_excel import CorgiAgentSystem, ExcelProcessor
-    # Note: ClaimDataGenerator is not a class but a function in synthesized_data
-    import synthesized_data
-    ClaimDataGenerator = synthesized_data  # Use the module itself
-except ImportError as e:
-    print(f"Warning: Could not import fraud detection modules: {e}")
-    print("The API will run with limited functionality.")
-    CorgiAgentSystem = None
-    ExcelProcessor = None
-    ClaimDataGenerator = None
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+from batch_store import CHANNEL_PREFIX, TASK_TTL, MemoryBatchStore, RedisBatchStore
+
+# The fraud detection modules pull in pandas, autogen and faker; they are imported by
+# lifespan in each worker rather than here, so importing this module stays cheap.
+CorgiAgentSystem = None
+ExcelProcessor = None
+ClaimDataGenerator = None
+
+@lru_cache(maxsize=1)
+def load_fraud_modules():
+    """Import the fraud detection modules once; all None if they are unavailable"""
+    try:
+        from agents_excel import CorgiAgentSystem, ExcelProcessor
+        # Note: ClaimDataGenerator is not a class but a function in synthesized_data
+        import synthesized_data
+        return CorgiAgentSystem, ExcelProcessor, synthesized_data  # Use the module itself
+    except ImportError as e:
+        print(f"Warning: Could not import fraud detection modules: {e}")
+        print("The API will run with limited functionality.")
+        return None, None, None
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+BATCH_PRUNE_INTERVAL = 300  # Seconds between sweeps of finished batch tasks
+# Threads behind asyncio.to_thread; each in-flight claim holds one for its whole agent chat
+THREAD_POOL_SIZE = int(os.getenv("THREAD_POOL_SIZE", "64"))
+
+def remove_expired_files(directory: str, max_age: float) -> int:
+    """Delete regular files directly under directory not modified for max_age seconds"""
+    cutoff = time.time() - max_age
+    removed = 0
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_file(follow_symlinks=False) and entry.stat().st_mtime < cutoff:
+                    try:
+                        os.remove(entry.path)
+                        removed += 1
+                    except FileNotFoundError:
+                        pass
+    except FileNotFoundError:
+        pass
+    return removed
+
+def is_stale_task(task: dict) -> bool:
+    """Failed tasks age out TASK_TTL after completed_at; finished ones once their files are gone"""
+    status = task.get("status")
+    if status == "processing":
+        return False
+    if status == "failed":
+        completed_at = task.get("completed_at")
+        return bool(completed_at) and time.time() - datetime.fromisoformat(completed_at).timestamp() > TASK_TTL
+    return not any(p and os.path.exists(p) for p in (task.get("file_path"), task.get("output_path")))
+
+async def prune_batch_tasks():
+    """Expire result files older than a task's TTL, then drop tasks whose files are gone"""
+    while True:
+        await asyncio.sleep(BATCH_PRUNE_INTERVAL)
+        # Store entries expire on their own, which would otherwise orphan their results on disk
+        removed = await asyncio.to_thread(remove_expired_files, UPLOAD_DIR, TASK_TTL)
+        if removed:
+            logger.info(f"Removed {removed} expired batch files")
+        stale = [task_id async for task_id, task in batch_tasks.items() if is_stale_task(task)]
+        for task_id in stale:
+            await batch_tasks.delete(task_id)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global fraud_system, upload_dir_fd, CorgiAgentSystem, ExcelProcessor, ClaimDataGenerator
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=THREAD_POOL_SIZE))
+    CorgiAgentSystem, ExcelProcessor, ClaimDataGenerator = await asyncio.to_thread(load_fraud_modules)
+    # Built per worker at startup, not at import, so a preloading master holds no agents
+    fraud_system = create_fraud_system()
+    await aiofiles.os.makedirs(DOCUMENTS_DIR, exist_ok=True)
+    upload_dir_fd = open_upload_dir()
+    # The template is static, so write it once per worker instead of per request
+    app.state.template_path = None
+    if ExcelProcessor:
+        app.state.template_path = await asyncio.to_thread(write_atomically, ExcelProcessor.generate_template, TEMPLATE_PATH)
+    prune_task = asyncio.create_task(prune_batch_tasks())
+    if redis_client is not None:
+        await manager.start_relay()
+    yield
+    prune_task.cancel()
+    await manager.stop_relay()
+    await batch_tasks.close()
+    if upload_dir_fd is not None:
+        os.close(upload_dir_fd)
+        upload_dir_fd = None
+    if fraud_system:
+        fraud_system.mcp.close()
+
 app = FastAPI(
     title="Corgi Fraud Detection API",
     description="Advanced Multi-Agent Fraud Detection System",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # In production, specify exact origins
+    # Comma-separated; the React dev server by default. Exact lists skip wildcard matching
+    allow_origins=os.getenv("ALLOWED_ORIGINS", "http://localhost:3000,http://127.0.0.1:3000").split(","),
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST"],
+    allow_headers=["Content-Type", "Authorization", "X-Task-ID"],
+    max_age=86400,  # Browsers cache each preflight for a day
 )
 
-# Initialize the fraud detection system
-if CorgiAgentSystem:
-    fraud_system = CorgiAgentSystem()
-else:
-    fraud_system = None
+# The fraud detection system, created by lifespan once the worker starts
+fraud_system = None
+
+def create_fraud_system():
+    if CorgiAgentSystem:
+        try:
+            return CorgiAgentSystem()
+        except ValueError as e:
+            logger.error(f"Fraud detection system unavailable: {e}")
+    return None
 
 # Data models
 class ClaimRequest(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     claimant: str
     claim_text: str
     claim_amount: Optional[float] = None
@@ -73,69 +185,329 @@ class ClaimRequest(BaseModel):
     transaction_hashes: Optional[str] = None
 
 class ClaimResponse(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     claim_id: str
     decision: str
     confidence: float
     processing_time: float
-    agent_scores: Dict
+    agent_scores: Dict[str, Any]  # Nested: per-agent scores plus agent_details dicts
     risk_factors: List[str]
     recommendations: List[str]
 
 class BatchProcessResponse(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     task_id: str
     status: str
     message: str
 
-# In-memory storage for batch processing tasks
-batch_tasks = {}
+# Batch task state, expired after a day. With REDIS_URL set it lives in Redis so
+# every uvicorn worker sees the same tasks; otherwise it is per-process memory.
+REDIS_URL = os.getenv("REDIS_URL")
+redis_client = aioredis.Redis.from_url(REDIS_URL) if REDIS_URL and aioredis else None
+batch_tasks = RedisBatchStore(redis_client) if redis_client is not None else MemoryBatchStore()
+
+# With USE_CELERY set, batches run on Celery workers (see tasks.py) instead of in
+# this process; they report back through the same Redis store and channels.
+process_excel_task = None
+if os.getenv("USE_CELERY", "").lower() in ("1", "true", "yes") and redis_client is not None:
+    try:
+        from tasks import process_excel_task
+    except ImportError as e:
+        logger.error(f"Celery unavailable, processing batches in-process: {e}")
+
+UPLOAD_CHUNK_SIZE = 1 << 20  # Read and write size for uploads, so each chunk is one syscall
+
+UPLOAD_DIR = "uploads"
+DOCUMENTS_DIR = os.path.join(UPLOAD_DIR, "documents")
+
+def safe_upload_name(filename: str) -> str:
+    """Drop any directory parts, POSIX or Windows, from a client-supplied filename"""
+    return PurePosixPath(filename.replace("\\", "/")).name
+
+def client_task_id(value: str) -> str:
+    """Normalize a client-chosen task ID to the uuid hex form the server mints"""
+    try:
+        return uuid.UUID(value).hex
+    except ValueError:
+        raise HTTPException(status_code=400, detail="X-Task-ID must be a UUID")
+
+# uploads/ held open for the worker's lifetime so per-request lookups there skip path resolution
+upload_dir_fd: Optional[int] = None
+
+def open_upload_dir() -> Optional[int]:
+    """Open UPLOAD_DIR as a directory fd, or None where dir_fd is unsupported (Windows)"""
+    if not hasattr(os, "O_DIRECTORY") or os.open not in os.supports_dir_fd:
+        return None
+    return os.open(UPLOAD_DIR, os.O_RDONLY | os.O_DIRECTORY)
+
+def upload_dir_entry(path: str) -> Tuple[Optional[int], str]:
+    """(dir_fd, name) for a file directly under uploads/, else (None, path)"""
+    if upload_dir_fd is not None and os.path.dirname(path) == UPLOAD_DIR:
+        return upload_dir_fd, os.path.basename(path)
+    return None, path
+
+def stat_upload(path: str) -> os.stat_result:
+    dir_fd, name = upload_dir_entry(path)
+    return os.stat(name, dir_fd=dir_fd)
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# When nginx fronts the API, set e.g. ACCEL_REDIRECT_PREFIX=/internal/ with
+#   location /internal/ { internal; alias <backend>/uploads/; sendfile on; tcp_nopush on; }
+# and result downloads are sent by nginx straight from the page cache.
+ACCEL_REDIRECT_PREFIX = os.getenv("ACCEL_REDIRECT_PREFIX")
+
+def xlsx_file_response(path: str, filename: str) -> FileResponse:
+    """FileResponse with a precomputed stat; raises FileNotFoundError if path is gone"""
+    return FileResponse(path, media_type=XLSX_MEDIA_TYPE, filename=filename, stat_result=stat_upload(path))
+
+# Cap how many batches run their agent pipelines at once
+MAX_CONCURRENT_BATCHES = int(os.getenv("MAX_CONCURRENT_BATCHES", "2"))
+batch_semaphore = asyncio.Semaphore(MAX_CONCURRENT_BATCHES)
+
+# Single claims beyond this many in flight are turned away rather than queued
+MAX_INFLIGHT_CLAIMS = int(os.getenv("MAX_INFLIGHT_CLAIMS", "16"))
+claim_semaphore = asyncio.Semaphore(MAX_INFLIGHT_CLAIMS)
+
+UPLOAD_SPOOL_SIZE = 64 << 20  # Larger Excel uploads spill to a temp file
+
+async def read_upload(file: UploadFile) -> Tuple[tempfile.SpooledTemporaryFile, str]:
+    """Buffer an upload in memory in chunks, hashing it on the way; rewound and ready for pandas"""
+    buffer = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_SIZE)
+    hasher = hashlib.blake2b(digest_size=32)
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        buffer.write(chunk)
+        hasher.update(chunk)
+    buffer.seek(0)
+    return buffer, hasher.hexdigest()
+
+async def find_processed_upload(digest: str) -> Optional[Tuple[str, Dict]]:
+    """The ID and completed task for an identical upload, if its results file is still on disk"""
+    task_id = await batch_tasks.get_digest_task(digest)
+    task = await batch_tasks.get(task_id) if task_id else None
+    if task and task.get("status") == "completed":
+        try:
+            stat_upload(task.get("output_path", ""))
+            return task_id, task
+        except FileNotFoundError:
+            pass
+    return None
+
+def advise_sequential(fd: int):
+    """Hint the kernel that fd is streamed front to back; a no-op where unsupported"""
+    if hasattr(os, "posix_fadvise"):
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+
+def write_atomically(build, path: str) -> str:
+    """Run build(tmp_path) beside path, then rename the result over it
+
+    Each uvicorn worker writes its own temp file, so none ever serves a
+    workbook another worker is still writing.
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{name}.", suffix=os.path.splitext(name)[1])
+    os.close(fd)
+    try:
+        build(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    return path
+
+def write_buffer(buffer: BinaryIO, file_path: str):
+    """Persist a buffered upload for a worker that reads it from disk"""
+    dir_fd, name = upload_dir_entry(file_path)
+    fd = os.open(name, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644, dir_fd=dir_fd)
+    advise_sequential(fd)
+    with buffer, os.fdopen(fd, "wb", buffering=UPLOAD_CHUNK_SIZE) as out:
+        shutil.copyfileobj(buffer, out, UPLOAD_CHUNK_SIZE)
+
+async def save_upload(file: UploadFile, file_path: str) -> int:
+    """Stream an upload to disk in chunks and return its size in bytes"""
+    size = 0
+    async with aiofiles.open(file_path, "wb", buffering=UPLOAD_CHUNK_SIZE) as out:
+        advise_sequential(out.fileno())
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            await out.write(chunk)
+            size += len(chunk)
+    return size
+
+_iso_cache = (0, "")
+
+def iso_now() -> str:
+    """Second-resolution ISO timestamp for messages, formatted at most once per second"""
+    global _iso_cache
+    second = int(time.time())
+    if _iso_cache[0] != second:
+        _iso_cache = (second, datetime.fromtimestamp(second).isoformat())
+    return _iso_cache[1]
+
+# Sec-WebSocket-Protocol values that switch a client to binary frames
+BINARY_SUBPROTOCOLS = ("msgpack", "json-binary") if msgpack is not None else ("json-binary",)
+
+def encode_message(data, fmt: str = "json"):
+    """Serialize a WebSocket message, or a list of them, to JSON text or a binary msgpack/JSON frame"""
+    if fmt == "msgpack":
+        return msgpack.packb(data, default=str)
+    payload = orjson.dumps(data, option=orjson.OPT_NAIVE_UTC, default=str)
+    return payload if fmt == "json-binary" else payload.decode()
 
 # WebSocket connection manager
 class ConnectionManager:
-    def __init__(self):
+    QUEUE_SIZE = 64  # Outgoing messages buffered per client
+    MAX_DROPS = 256  # Consecutive drops before a stalled client is disconnected
+    HEARTBEAT_INTERVAL = 30
+    BATCH_WINDOW = 0.02  # Seconds a writer waits to coalesce updates into one frame
+    BATCH_SIZE = 32  # Most updates sent in one frame
+    CHANNEL_PREFIX = CHANNEL_PREFIX
+    ORIGIN_SEPARATOR = "@"  # API workers publish on ws:{task_id}@{origin}; Celery workers on ws:{task_id}
+    RELAY_RETRY_DELAY = 0.5  # First relay restart backoff in seconds, doubled up to RELAY_MAX_DELAY
+    RELAY_MAX_DELAY = 30.0
+
+    def __init__(self, redis=None):
+        self.redis = redis  # Fans updates out to the other workers, which may hold the socket
+        self.origin = uuid.uuid4().hex  # Lets the relay skip this worker's own publishes
+        self._relay_task: Optional[asyncio.Task] = None
         self.active_connections: Dict[str, WebSocket] = {}
-        self.pending_updates: Dict[str, List[dict]] = {}  # Store updates for reconnection
+        self.pending_updates: Dict[str, List[dict]] = TTLCache(maxsize=1_000, ttl=600)  # Store updates for reconnection
+        self.queues: Dict[str, asyncio.Queue] = {}
+        self.writers: Dict[str, asyncio.Task] = {}
+        self.drops: Dict[str, int] = {}
+        self.formats: Dict[str, str] = {}
+        self._hb_task: Optional[asyncio.Task] = None
+        self._closing: set = set()  # Close handshakes in flight, referenced so they finish
 
     async def connect(self, websocket: WebSocket, task_id: str):
-        await websocket.accept()
+        # Clients opt into binary frames via Sec-WebSocket-Protocol, first offered wins; JSON text is the default
+        offered = websocket.scope.get("subprotocols", [])
+        subprotocol = next((name for name in offered if name in BINARY_SUBPROTOCOLS), None)
+        await websocket.accept(subprotocol=subprotocol)
+        previous = self.active_connections.get(task_id)
+        if previous is not None:
+            # The newer socket takes over; closing the old one ends its endpoint
+            self.disconnect(task_id, previous)
+            self._close(previous, 1000)
         self.active_connections[task_id] = websocket
+        self.formats[task_id] = subprotocol or "json"
+        self.queues[task_id] = asyncio.Queue(maxsize=self.QUEUE_SIZE)
+        self.drops[task_id] = 0
         logger.info(f"WebSocket connection established for task {task_id}")
         
-        # Send any pending updates that were missed during disconnection
-        if task_id in self.pending_updates:
-            for update in self.pending_updates[task_id]:
-                try:
-                    await websocket.send_text(json.dumps(update))
-                    logger.debug(f"Sent pending update to {task_id}: {update.get('type', 'unknown')}")
-                except Exception as e:
-                    logger.error(f"Error sending pending update to {task_id}: {e}")
-                    break
-            # Clear pending updates after sending
-            del self.pending_updates[task_id]
-
-    def disconnect(self, task_id: str):
-        if task_id in self.active_connections:
+        # Queue any pending updates that were missed during disconnection
+        for update in self.pending_updates.pop(task_id, []):
+            self._enqueue(task_id, update)
+        self.writers[task_id] = asyncio.create_task(self._writer(task_id, websocket, self.queues[task_id]))
+        # Started lazily since there is no running loop at import time
+        if self._hb_task is None or self._hb_task.done():
+            self._hb_task = asyncio.create_task(self._heartbeat_loop())
+
+    def disconnect(self, task_id: str, websocket: WebSocket):
+        """Remove websocket's connection, unless task_id has since moved to a newer socket"""
+        if self.active_connections.get(task_id) is websocket:
             del self.active_connections[task_id]
+            self.drops.pop(task_id, None)
+            self.formats.pop(task_id, None)
+            writer = self.writers.pop(task_id, None)
+            if writer and writer is not asyncio.current_task():
+                writer.cancel()
+            # Keep undelivered messages for the next connection
+            queue = self.queues.pop(task_id)
+            while not queue.empty():
+                self._store_pending_update(task_id, queue.get_nowait()[0])
             logger.info(f"WebSocket connection removed for task {task_id}")
 
-    async def send_progress_update(self, task_id: str, data: dict):
-        if task_id in self.active_connections:
+    def _close(self, websocket: WebSocket, code: int):
+        """Close a socket in the background; callers may be synchronous"""
+        async def close():
             try:
-                websocket = self.active_connections[task_id]
-                if websocket.client_state.name == "CONNECTED":
-                    await websocket.send_text(json.dumps(data))
-                    logger.debug(f"Sent WebSocket update to {task_id}: {data.get('type', 'unknown')}")
-                else:
+                await websocket.close(code)
+            except Exception as e:
+                logger.debug(f"Error closing WebSocket: {e}")
+        task = asyncio.create_task(close())
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def _writer(self, task_id: str, websocket: WebSocket, queue: asyncio.Queue):
+        """Drain one client's queue so a slow socket only delays itself"""
+        fmt = self.formats[task_id]
+        while True:
+            batch = [await queue.get()]
+            # Messages arriving within BATCH_WINDOW go out together as one JSON array frame
+            await asyncio.sleep(self.BATCH_WINDOW)
+            while len(batch) < self.BATCH_SIZE and not queue.empty():
+                batch.append(queue.get_nowait())
+            updates = [data for data, _ in batch]
+            try:
+                if websocket.client_state.name != "CONNECTED":
                     logger.warning(f"WebSocket for task {task_id} not in CONNECTED state")
-                    self._store_pending_update(task_id, data)
-                    self.disconnect(task_id)
+                    for data in updates:
+                        self._store_pending_update(task_id, data)
+                    self.disconnect(task_id, websocket)
+                    return
+                payload = batch[0][1] if len(batch) == 1 else encode_message(updates, fmt)
+                if isinstance(payload, bytes):
+                    await websocket.send_bytes(payload)
+                else:
+                    await websocket.send_text(payload)
+                self.drops[task_id] = 0
+                logger.debug("Sent %d WebSocket update(s) to %s", len(updates), task_id)
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
                 logger.error(f"Error sending WebSocket message to {task_id}: {e}")
-                self._store_pending_update(task_id, data)
-                self.disconnect(task_id)
+                for data in updates:
+                    self._store_pending_update(task_id, data)
+                self.disconnect(task_id, websocket)
+                return
+
+    def _enqueue(self, task_id: str, data: dict, frames: Optional[Dict[str, object]] = None):
+        """Queue a message for a client, dropping its oldest message when full"""
+        # frames caches one encoding per wire format so broadcasts encode at most twice
+        fmt = self.formats[task_id]
+        if frames is None:
+            payload = encode_message(data, fmt)
+        elif fmt in frames:
+            payload = frames[fmt]
+        else:
+            payload = frames[fmt] = encode_message(data, fmt)
+        queue = self.queues[task_id]
+        try:
+            queue.put_nowait((data, payload))
+        except asyncio.QueueFull:
+            queue.get_nowait()
+            queue.put_nowait((data, payload))
+            self.drops[task_id] += 1
+            if self.drops[task_id] >= self.MAX_DROPS:
+                logger.warning(f"WebSocket for task {task_id} is not keeping up, disconnecting")
+                # 1013 (try again later) ends the endpoint so the client can reconnect and catch up
+                websocket = self.active_connections[task_id]
+                self.disconnect(task_id, websocket)
+                self._close(websocket, 1013)
+
+    async def send_progress_update(self, task_id: str, data: dict):
+        # Local sockets never wait on Redis; publishing only reaches the other workers
+        self._deliver(task_id, data)
+        if self.redis is not None:
+            channel = f"{self.CHANNEL_PREFIX}{task_id}{self.ORIGIN_SEPARATOR}{self.origin}"
+            try:
+                await self.redis.publish(channel, orjson.dumps(data, default=str))
+            except Exception as e:
+                logger.warning(f"Could not publish WebSocket update for task {task_id}: {e}")
+
+    def _deliver(self, task_id: str, data: dict):
+        """Hand an update to this process's connection, or keep it for a reconnect"""
+        if task_id in self.queues:
+            self._enqueue(task_id, data)
         else:
             # Store update for when client reconnects
             self._store_pending_update(task_id, data)
-            logger.debug(f"No active WebSocket connection for task {task_id}, storing update for later")
+            logger.debug("No active WebSocket connection for task %s, storing update for later", task_id)
 
     def _store_pending_update(self, task_id: str, data: dict):
         """Store updates for tasks that don't have active connections"""
@@ -148,24 +520,62 @@ class ConnectionManager:
             # Keep only the last 10 updates to prevent memory issues
             self.pending_updates[task_id] = self.pending_updates[task_id][-10:]
 
-    async def broadcast_to_all(self, data: dict):
-        disconnected_tasks = []
-        for task_id, websocket in self.active_connections.items():
+    async def start_relay(self):
+        """Deliver other workers' updates to local sockets until stop_relay"""
+        self._relay_task = asyncio.create_task(self._relay_forever())
+
+    async def stop_relay(self):
+        if self._relay_task:
+            self._relay_task.cancel()
+
+    async def _relay_forever(self):
+        """Run the relay, resubscribing with exponential backoff whenever it fails"""
+        delay = self.RELAY_RETRY_DELAY
+        while True:
             try:
-                if websocket.client_state.name == "CONNECTED":
-                    await websocket.send_text(json.dumps(data))
-                else:
-                    disconnected_tasks.append(task_id)
+                pubsub = self.redis.pubsub()
+                await pubsub.psubscribe(f"{self.CHANNEL_PREFIX}*")
+                delay = self.RELAY_RETRY_DELAY
+                await self._relay_loop(pubsub)
+                logger.error(f"WebSocket relay stopped, restarting in {delay:.1f}s")
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
-                logger.error(f"Error broadcasting to {task_id}: {e}")
-                disconnected_tasks.append(task_id)
-        
-        # Clean up disconnected connections and store updates
-        for task_id in disconnected_tasks:
-            self._store_pending_update(task_id, data)
-            self.disconnect(task_id)
+                logger.error(f"WebSocket relay failed, restarting in {delay:.1f}s: {e}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.RELAY_MAX_DELAY)
 
-manager = ConnectionManager()
+    async def _relay_loop(self, pubsub):
+        try:
+            async for message in pubsub.listen():
+                if message["type"] != "pmessage":
+                    continue
+                channel = message["channel"]
+                channel = channel.decode() if isinstance(channel, bytes) else channel
+                task_id, _, origin = channel[len(self.CHANNEL_PREFIX):].partition(self.ORIGIN_SEPARATOR)
+                if origin != self.origin:
+                    self._deliver(task_id, orjson.loads(message["data"]))
+        finally:
+            await pubsub.aclose()
+
+    async def _heartbeat_loop(self):
+        """Send one shared heartbeat frame to every connection each interval"""
+        while True:
+            await asyncio.sleep(self.HEARTBEAT_INTERVAL)
+            if self.queues:
+                await self.broadcast_to_all({
+                    "type": "heartbeat",
+                    "message": "Connection alive",
+                    "timestamp": iso_now()
+                })
+
+    async def broadcast_to_all(self, data: dict):
+        # Encode once per wire format and hand the same frame to every client's queue
+        frames: Dict[str, object] = {}
+        for task_id in list(self.queues):
+            self._enqueue(task_id, data, frames)
+
+manager = ConnectionManager(redis_client)
 
 @app.websocket("/ws/{task_id}")
 async def websocket_endpoint(websocket: WebSocket, task_id: str):
@@ -179,12 +589,12 @@ async def websocket_endpoint(websocket: WebSocket, task_id: str):
             "type": "connection_established",
             "task_id": task_id,
             "message": "Connected to batch processing updates",
-            "timestamp": datetime.now().isoformat()
+            "timestamp": iso_now()
         })
         
         # If task exists, send current status immediately
-        if task_id in batch_tasks:
-            task_data = batch_tasks[task_id]
+        task_data = await batch_tasks.get(task_id)
+        if task_data is not None:
             status = task_data.get("status", "unknown")
             progress = task_data.get("progress", 0)
             
@@ -197,7 +607,7 @@ async def websocket_endpoint(websocket: WebSocket, task_id: str):
                     "message": "Batch processing completed successfully!",
                     "processing_time": f'{task_data.get("processing_time", 0):.2f} seconds',
                     "output_path": task_data.get("output_path", ""),
-                    "timestamp": datetime.now().isoformat()
+                    "timestamp": iso_now()
                 })
             elif status == "failed":
                 await manager.send_progress_update(task_id, {
@@ -205,7 +615,7 @@ async def websocket_endpoint(websocket: WebSocket, task_id: str):
                     "task_id": task_id,
                     "status": "failed",
                     "error": task_data.get("error", "Unknown error"),
-                    "timestamp": datetime.now().isoformat()
+                    "timestamp": iso_now()
                 })
             elif status == "processing":
                 await manager.send_progress_update(task_id, {
@@ -214,55 +624,22 @@ async def websocket_endpoint(websocket: WebSocket, task_id: str):
                     "status": "processing",
                     "progress": progress,
                     "message": f"Processing in progress... {progress}%",
-                    "timestamp": datetime.now().isoformat()
+                    "timestamp": iso_now()
                 })
         
-        # Keep connection alive - focus on maintaining connection, not receiving messages
-        heartbeat_task = None
-        try:
-            # Start heartbeat task for this connection
-            heartbeat_task = asyncio.create_task(send_periodic_heartbeat(task_id, 30))
-            
-            # Wait for client to disconnect - use a simple ping mechanism
-            while True:
-                try:
-                    # Check if connection is still alive by trying to ping
-                    await websocket.ping()
-                    await asyncio.sleep(10)  # Check every 10 seconds
-                except Exception:
-                    logger.info(f"WebSocket ping failed for task {task_id}, connection lost")
-                    break
-                    
-        finally:
-            if heartbeat_task:
-                heartbeat_task.cancel()
-                try:
-                    await heartbeat_task
-                except asyncio.CancelledError:
-                    pass
+        # Block until the client sends or disconnects; uvicorn handles protocol pings
+        while True:
+            try:
+                await websocket.receive_text()
+            except WebSocketDisconnect:
+                break
             
     except WebSocketDisconnect:
         logger.info(f"WebSocket disconnected for task {task_id}")
     except Exception as e:
         logger.error(f"WebSocket error for task {task_id}: {e}")
     finally:
-        manager.disconnect(task_id)
-
-async def send_periodic_heartbeat(task_id: str, interval: int):
-    """Send periodic heartbeat messages to keep connection alive"""
-    try:
-        while True:
-            await asyncio.sleep(interval)
-            await manager.send_progress_update(task_id, {
-                "type": "heartbeat",
-                "task_id": task_id,
-                "message": "Connection alive",
-                "timestamp": datetime.now().isoformat()
-            })
-    except asyncio.CancelledError:
-        pass
-    except Exception as e:
-        logger.error(f"Heartbeat error for task {task_id}: {e}")
+        manager.disconnect(task_id, websocket)
 
 @app.get("/")
 async def root():
@@ -270,13 +647,20 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "timestamp": datetime.now().isoformat()}
+    return {"status": "healthy", "timestamp": iso_now()}
+
+HIGH_RISK_THRESHOLD = 0.7
+MONITOR_THRESHOLD = 0.5
+HIGH_RISK_FMT = "High risk detected by {} (score: {:.2f})"
+MONITOR_FMT = "Monitor {} indicators (score: {:.2f})"
 
 @app.post("/api/analyze-claim", response_model=ClaimResponse)
 async def analyze_single_claim(claim: ClaimRequest):
     """Analyze a single claim for fraud detection"""
     if not fraud_system:
         raise HTTPException(status_code=503, detail="Fraud detection system not available")
+    if claim_semaphore.locked():
+        raise HTTPException(status_code=503, detail="Too many claims in progress", headers={"Retry-After": "2"})
     
     try:
         # Prepare metadata
@@ -295,27 +679,21 @@ async def analyze_single_claim(claim: ClaimRequest):
         metadata = {k: v for k, v in metadata.items() if v is not None}
         
         # Process the claim
-        result = fraud_system.process_claim(
-            claim_text=claim.claim_text,
-            claimant=claim.claimant,
-            metadata=metadata
-        )
+        async with claim_semaphore:
+            result = await asyncio.to_thread(
+                fraud_system.process_claim,
+                claim_text=claim.claim_text,
+                claimant=claim.claimant,
+                metadata=metadata
+            )
         
         # Extract risk factors and recommendations from agent scores
-        risk_factors = []
-        recommendations = []
-        
-        if result.get("agent_scores", {}).get("scores"):
-            scores = result["agent_scores"]["scores"]
-            for agent, score in scores.items():
-                if score > 0.7:
-                    risk_factors.append(f"High risk detected by {agent} (score: {score:.2f})")
-                elif score > 0.5:
-                    recommendations.append(f"Monitor {agent} indicators (score: {score:.2f})")
+        scores = result.get("agent_scores", {}).get("scores") or {}
+        risk_factors = [HIGH_RISK_FMT.format(agent, score) for agent, score in scores.items() if score > HIGH_RISK_THRESHOLD]
+        recommendations = [MONITOR_FMT.format(agent, score) for agent, score in scores.items() if MONITOR_THRESHOLD < score <= HIGH_RISK_THRESHOLD]
         
         if result["decision"] == "REJECT":
-            recommendations.append("Recommend manual review")
-            recommendations.append("Contact claimant for additional documentation")
+            recommendations += ("Recommend manual review", "Contact claimant for additional documentation")
         
         return ClaimResponse(
             claim_id=result["claim_id"],
@@ -332,37 +710,77 @@ async def analyze_single_claim(claim: ClaimRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/upload-excel")
-async def upload_excel_file(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
+async def upload_excel_file(background_tasks: BackgroundTasks, file: UploadFile = File(...),
+                            x_task_id: Optional[str] = Header(None)):
     """Upload and process an Excel file with multiple claims"""
     if not fraud_system:
         raise HTTPException(status_code=503, detail="Fraud detection system not available. Please check OpenAI API key configuration.")
     
+    # Clients may pick the task ID so they can open its WebSocket before the upload finishes;
+    # it is reserved before the body is read so a concurrent upload with the same ID gets 409
+    if x_task_id:
+        task_id = client_task_id(x_task_id)
+        if not await batch_tasks.reserve(task_id, {
+            "status": "processing",
+            "filename": file.filename,
+            "created_at": iso_now(),
+            "progress": 0
+        }):
+            raise HTTPException(status_code=409, detail="Task ID already in use")
+    else:
+        task_id = uuid.uuid4().hex
+    
     try:
         if not file.filename.endswith(('.xlsx', '.xls')):
             raise HTTPException(status_code=400, detail="File must be an Excel file (.xlsx or .xls)")
         
-        # Generate unique task ID
-        task_id = str(uuid.uuid4())
+        # Keep the upload in memory; only the processed results are written under uploads/
+        file_path = os.path.join(UPLOAD_DIR, f"{task_id}_{safe_upload_name(file.filename)}")
         
-        # Save uploaded file
-        upload_dir = "uploads"
-        os.makedirs(upload_dir, exist_ok=True)
-        file_path = os.path.join(upload_dir, f"{task_id}_{file.filename}")
+        buffer, digest = await read_upload(file)
         
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        # Identical workbook already processed: reuse its results instead of rerunning the agents
+        processed = await find_processed_upload(digest)
+        if processed is not None:
+            prior_task_id, prior = processed
+            buffer.close()
+            await batch_tasks.set(task_id, {
+                **prior,
+                "filename": file.filename,
+                "created_at": iso_now(),
+                "deduplicated_from": prior_task_id
+            })
+            await manager.send_progress_update(task_id, {
+                "type": "completed",
+                "task_id": task_id,
+                "status": "completed",
+                "progress": 100,
+                "message": "Identical file already processed; reusing its results.",
+                "processing_time": f'{prior.get("processing_time", 0):.2f} seconds',
+                "output_path": prior["output_path"],
+                "timestamp": iso_now()
+            })
+            manager.pending_updates.pop(task_id, None)
+            return BatchProcessResponse(
+                task_id=task_id,
+                status="completed",
+                message="Identical file already processed. Reusing previous results."
+            )
         
         # Initialize task status
-        batch_tasks[task_id] = {
+        await batch_tasks.set(task_id, {
             "status": "processing",
-            "file_path": file_path,
-            "created_at": datetime.now().isoformat(),
+            "filename": file.filename,
+            "created_at": iso_now(),
             "progress": 0
-        }
+        })
         
         # Process in background
-        background_tasks.add_task(process_excel_background, task_id, file_path)
+        if process_excel_task is not None:
+            await asyncio.to_thread(write_buffer, buffer, file_path)
+            process_excel_task.delay(task_id, os.path.abspath(file_path), digest)
+        else:
+            background_tasks.add_task(process_excel_background, task_id, file_path, buffer, digest)
         
         return BatchProcessResponse(
             task_id=task_id,
@@ -372,10 +790,31 @@ async def upload_excel_file(background_tasks: BackgroundTasks, file: UploadFile
         
     except Exception as e:
         logger.error(f"Error uploading file: {e}")
+        if x_task_id:
+            await batch_tasks.delete(task_id)  # Release the reserved ID
         raise HTTPException(status_code=500, detail=str(e))
 
-async def process_excel_background(task_id: str, file_path: str):
-    """Background task to process Excel file with WebSocket updates"""
+def count_claim_rows(source) -> int:
+    """Count data rows from the sheet dimensions without parsing cells"""
+    wb = load_workbook(source, read_only=True, data_only=True)
+    try:
+        ws = wb.active
+        rows = ws.max_row
+        if rows is None:
+            # Workbook saved without a dimension record; stream the rows instead
+            rows = sum(1 for _ in ws.iter_rows(values_only=True))
+        return max(rows - 1, 0)  # minus header
+    finally:
+        wb.close()
+
+async def process_excel_background(task_id: str, file_path: str, source: Optional[BinaryIO] = None,
+                                   digest: Optional[str] = None):
+    """Background task to process Excel file with WebSocket updates
+
+    file_path names the batch and its results file; source, when given, holds
+    the uploaded workbook so it is never round-tripped through disk.
+    """
+    source = source if source is not None else file_path
     try:
         # Increased delay to allow WebSocket connection to be established
         # Frontend typically takes 1-2 seconds to establish WebSocket after getting task_id
@@ -388,11 +827,10 @@ async def process_excel_background(task_id: str, file_path: str):
             "status": "starting",
             "progress": 0,
             "message": "Initializing batch processing...",
-            "timestamp": datetime.now().isoformat()
+            "timestamp": iso_now()
         })
         
-        batch_tasks[task_id]["status"] = "processing"
-        batch_tasks[task_id]["progress"] = 5
+        await batch_tasks.update(task_id, status="processing", progress=5)
         
         # Check if fraud system is available
         if not fraud_system:
@@ -402,7 +840,7 @@ async def process_excel_background(task_id: str, file_path: str):
                 "task_id": task_id,
                 "status": "failed",
                 "error": error_msg,
-                "timestamp": datetime.now().isoformat()
+                "timestamp": iso_now()
             })
             raise Exception(error_msg)
         
@@ -413,13 +851,12 @@ async def process_excel_background(task_id: str, file_path: str):
             "status": "processing",
             "progress": 10,
             "message": "Loading Excel file...",
-            "timestamp": datetime.now().isoformat()
+            "timestamp": iso_now()
         })
         
         # Read the Excel file to get row count for progress tracking
         try:
-            df = pd.read_excel(file_path)
-            total_rows = len(df)
+            total_rows = await asyncio.to_thread(count_claim_rows, source)
             
             await manager.send_progress_update(task_id, {
                 "type": "progress",
@@ -428,7 +865,7 @@ async def process_excel_background(task_id: str, file_path: str):
                 "progress": 20,
                 "message": f"Found {total_rows} claims to process...",
                 "total_items": total_rows,
-                "timestamp": datetime.now().isoformat()
+                "timestamp": iso_now()
             })
         except Exception as e:
             await manager.send_progress_update(task_id, {
@@ -437,36 +874,47 @@ async def process_excel_background(task_id: str, file_path: str):
                 "status": "processing",
                 "progress": 20,
                 "message": "Processing Excel file...",
-                "timestamp": datetime.now().isoformat()
-            })
-        
-        # Simulate processing steps with progress updates
-        processing_steps = [
-            (30, "Validating claim data..."),
-            (40, "Initializing AI agents..."),
-            (50, "Running fraud detection analysis..."),
-            (70, "Evaluating risk factors..."),
-            (85, "Generating recommendations..."),
-            (95, "Finalizing results...")
-        ]
-        
-        for progress, message in processing_steps:
-            await asyncio.sleep(1)  # Simulate processing time
-            batch_tasks[task_id]["progress"] = progress
-            
-            await manager.send_progress_update(task_id, {
-                "type": "progress",
-                "task_id": task_id,
-                "status": "processing",
-                "progress": progress,
-                "message": message,
-                "timestamp": datetime.now().isoformat()
+                "timestamp": iso_now()
             })
         
+        loop = asyncio.get_running_loop()
+        report_lock = asyncio.Lock()
+        pending_reports = []
+
+        async def report(pct: int, message: str):
+            # Map claim completion onto the 20-95% band left after loading
+            progress = 20 + pct * 75 // 100
+            # Ticks land one at a time, in the order process_excel reported them
+            async with report_lock:
+                await batch_tasks.update(task_id, progress=progress)
+                await manager.send_progress_update(task_id, {
+                    "type": "progress",
+                    "task_id": task_id,
+                    "status": "processing",
+                    "progress": progress,
+                    "message": message,
+                    "timestamp": iso_now()
+                })
+
+        def progress_cb(pct: int, message: str):
+            pending_reports.append(asyncio.run_coroutine_threadsafe(report(pct, message), loop))
+
         # Process the Excel file
-        start_time = time.time()
-        output_path = fraud_system.process_excel(file_path)
-        processing_time = time.time() - start_time
+        async with batch_semaphore:
+            start_time = time.time()
+            if hasattr(source, "seek"):
+                source.seek(0)
+            try:
+                output_path = await asyncio.to_thread(
+                    fraud_system.process_excel, source, progress_cb=progress_cb,
+                    output_path=ExcelProcessor.results_path(file_path)
+                )
+            finally:
+                # Every tick lands before the final status, so none can flip it back to processing
+                for outcome in await asyncio.gather(*map(asyncio.wrap_future, pending_reports), return_exceptions=True):
+                    if isinstance(outcome, Exception):
+                        logger.warning(f"Progress update failed for task {task_id}: {outcome}")
+            processing_time = time.time() - start_time
         
         # Send completion update
         await manager.send_progress_update(task_id, {
@@ -477,16 +925,21 @@ async def process_excel_background(task_id: str, file_path: str):
             "message": "Batch processing completed successfully!",
             "processing_time": f"{processing_time:.2f} seconds",
             "output_path": output_path,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": iso_now()
         })
         
-        batch_tasks[task_id].update({
-            "status": "completed",
-            "output_path": output_path,
-            "completed_at": datetime.now().isoformat(),
-            "progress": 100,
-            "processing_time": processing_time
-        })
+        await batch_tasks.update(
+            task_id,
+            status="completed",
+            output_path=output_path,
+            completed_at=iso_now(),
+            progress=100,
+            processing_time=processing_time
+        )
+        # Reconnecting clients get the final state from batch_tasks instead
+        manager.pending_updates.pop(task_id, None)
+        if digest:
+            await batch_tasks.set_digest_task(digest, task_id)
         
     except Exception as e:
         error_msg = str(e)
@@ -498,79 +951,91 @@ async def process_excel_background(task_id: str, file_path: str):
             "task_id": task_id,
             "status": "failed",
             "error": error_msg,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": iso_now()
         })
         
-        batch_tasks[task_id].update({
-            "status": "failed",
-            "error": error_msg,
-            "completed_at": datetime.now().isoformat()
-        })
+        await batch_tasks.update(
+            task_id,
+            status="failed",
+            error=error_msg,
+            completed_at=iso_now()
+        )
+        manager.pending_updates.pop(task_id, None)
+    finally:
+        if hasattr(source, "close"):
+            source.close()
 
 @app.get("/api/batch-status/{task_id}")
 async def get_batch_status(task_id: str):
     """Get the status of a batch processing task"""
-    if task_id not in batch_tasks:
+    task = await batch_tasks.get(task_id)
+    if task is None:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    return batch_tasks[task_id]
+    # Store values are already JSON-native; skip jsonable_encoder and let orjson write them
+    return ORJSONResponse(task)
 
 @app.get("/api/download-results/{task_id}")
 async def download_results(task_id: str):
     """Download the processed results file"""
-    if task_id not in batch_tasks:
+    task = await batch_tasks.get(task_id)
+    if task is None:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    task = batch_tasks[task_id]
     if task["status"] != "completed":
         raise HTTPException(status_code=400, detail="Task not completed")
     
     output_path = task["output_path"]
-    if not os.path.exists(output_path):
-        raise HTTPException(status_code=404, detail="Results file not found")
+    filename = os.path.basename(output_path)
+    if ACCEL_REDIRECT_PREFIX:
+        return Response(media_type=XLSX_MEDIA_TYPE, headers={
+            "X-Accel-Redirect": f"{ACCEL_REDIRECT_PREFIX}{filename}",
+            "Content-Disposition": f'attachment; filename="{filename}"'
+        })
     
-    return FileResponse(
-        output_path,
-        media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        filename=os.path.basename(output_path)
-    )
+    try:
+        return xlsx_file_response(output_path, filename)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Results file not found")
 
 @app.get("/api/generate-template")
-async def generate_template():
-    """Generate and download an Excel template for claims"""
-    if not ExcelProcessor:
+async def generate_template(request: Request):
+    """Download the Excel template for claims, generated at startup"""
+    template_path = getattr(request.app.state, "template_path", None)
+    if not ExcelProcessor or not template_path:
         raise HTTPException(status_code=503, detail="Excel processing not available")
     
     try:
-        template_path = ExcelProcessor.generate_template("claims_template.xlsx")
-        
-        return FileResponse(
-            template_path,
-            media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            filename="claims_template.xlsx"
-        )
+        return xlsx_file_response(template_path, "claims_template.xlsx")
         
     except Exception as e:
         logger.error(f"Error generating template: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def build_sample_data(num_claims: int) -> str:
+    """Generate a fresh sample workbook in its own temp file; the caller removes it"""
+    fd, output_path = tempfile.mkstemp(prefix="sample_claims_", suffix=".xlsx")
+    os.close(fd)
+    try:
+        # Use the function from synthesized_data module
+        ClaimDataGenerator.generate_complex_claims(output_path, num_claims=num_claims)
+    except BaseException:
+        os.remove(output_path)
+        raise
+    return output_path
+
 @app.get("/api/generate-sample-data")
-async def generate_sample_data():
+async def generate_sample_data(num_claims: int = Query(50, ge=1, le=10_000)):
     """Generate sample fraud detection data"""
     if not ClaimDataGenerator:
         raise HTTPException(status_code=503, detail="Sample data generation not available")
     
     try:
-        # Use the function from synthesized_data module
-        df = ClaimDataGenerator.generate_complex_claims("sample_claims.xlsx", num_claims=50)
-        
-        output_path = "sample_claims.xlsx"
+        output_path = await asyncio.to_thread(build_sample_data, num_claims)
         
-        return FileResponse(
-            output_path,
-            media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            filename="sample_claims.xlsx"
-        )
+        response = xlsx_file_response(output_path, "sample_claims.xlsx")
+        response.background = BackgroundTask(os.remove, output_path)  # Deleted once sent
+        return response
         
     except Exception as e:
         logger.error(f"Error generating sample data: {e}")
@@ -581,62 +1046,41 @@ async def get_system_stats():
     """Get system statistics and metrics"""
     try:
         # Get agent versions and configuration
+        history = fraud_system.mcp.history
         stats = {
             "agent_versions": fraud_system.agent_versions,
-            "total_processed": len(fraud_system.mcp.history),
-            "recent_activity": fraud_system.mcp.history[-10:] if fraud_system.mcp.history else [],
+            "total_processed": len(history),
+            "recent_activity": [fraud_system.mcp.serialize_record(r) for r in history[-10:]],
             "system_status": "operational",
-            "last_updated": datetime.now().isoformat()
+            "last_updated": datetime.now()  # orjson writes datetimes natively
         }
         
-        return stats
+        return ORJSONResponse(stats)
         
     except Exception as e:
         logger.error(f"Error getting stats: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-# Serve static files for the frontend (only if the build directory exists)
-frontend_build_path = "../frontend/build"
-if os.path.exists(frontend_build_path):
-    app.mount("/static", StaticFiles(directory="../frontend/build/static"), name="static")
-
-    @app.get("/{path:path}")
-    async def serve_frontend(path: str):
-        """Serve the React frontend"""
-        if os.path.exists(os.path.join(frontend_build_path, path)):
-            return FileResponse(os.path.join(frontend_build_path, path))
-        else:
-            return FileResponse(os.path.join(frontend_build_path, "index.html"))
-else:
-    @app.get("/frontend-status")
-    async def frontend_status():
-        return {"message": "Frontend not built yet. Run 'npm run build' in the frontend directory."}
-
 @app.post("/api/upload-documents")
 async def upload_supporting_documents(files: List[UploadFile] = File(...)):
     """Upload supporting documents for a claim"""
     try:
         uploaded_files = []
-        upload_dir = "uploads/documents"
-        os.makedirs(upload_dir, exist_ok=True)
         
         for file in files:
             # Generate unique filename
-            file_id = str(uuid.uuid4())
-            file_extension = os.path.splitext(file.filename)[1]
-            safe_filename = f"{file_id}_{file.filename}"
-            file_path = os.path.join(upload_dir, safe_filename)
+            file_id = uuid.uuid4().hex
+            safe_filename = f"{file_id}_{safe_upload_name(file.filename)}"
+            file_path = os.path.join(DOCUMENTS_DIR, safe_filename)
             
             # Save file
-            with open(file_path, "wb") as buffer:
-                content = await file.read()
-                buffer.write(content)
+            size = await save_upload(file, file_path)
             
             uploaded_files.append({
                 "filename": file.filename,
                 "file_id": file_id,
                 "file_path": file_path,
-                "size": len(content),
+                "size": size,
                 "content_type": file.content_type
             })
         
@@ -649,44 +1093,90 @@ async def upload_supporting_documents(files: List[UploadFile] = File(...)):
         logger.error(f"Error uploading files: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+TEMPLATE_PATH = "claims_template.xlsx"
+
+@lru_cache(maxsize=1)
+def template_bytes() -> Tuple[bytes, str]:
+    """Build the batch claims template once and return its bytes and ETag"""
+    try:
+        with open(TEMPLATE_PATH, "rb") as f:
+            content = f.read()
+    except FileNotFoundError:
+        # Create a basic template
+        template_data = {
+            'ClaimID': ['CLM-EXAMPLE-001'],
+            'Claimant': ['Example Claimant'],
+            'ClaimText': ['Sample claim description. Replace with your actual claim details.'],
+            'ClaimAmount': [1000.00],
+            'IncidentDate': ['2025-01-01'],
+            'PolicyNumber': ['POL-EXAMPLE-001'],
+            'ClaimType': ['Auto'],
+            'SupportingDocs': ['document1.pdf, document2.pdf'],
+            'ContactEmail': ['example@email.com'],
+            'Location': ['40.7128,-74.0060'],
+            'MedicalCodes': ['ICD-10:S72.8X1A'],
+            'TransactionHashes': ['0xabc123...']
+        }
+        import pandas as pd
+        buffer = io.BytesIO()
+        pd.DataFrame(template_data).to_excel(buffer, index=False, engine="openpyxl")
+        content = buffer.getvalue()
+    return content, f'"{hashlib.blake2b(content, digest_size=16).hexdigest()}"'
+
 @app.get("/api/download-template")
-async def download_template():
+async def download_template(request: Request):
     """Download Excel template for batch claims processing"""
     try:
-        template_path = "claims_template.xlsx"
-        
-        # Create template if it doesn't exist
-        if not os.path.exists(template_path):
-            # Create a basic template
-            import pandas as pd
-            template_data = {
-                'ClaimID': ['CLM-EXAMPLE-001'],
-                'Claimant': ['Example Claimant'],
-                'ClaimText': ['Sample claim description. Replace with your actual claim details.'],
-                'ClaimAmount': [1000.00],
-                'IncidentDate': ['2025-01-01'],
-                'PolicyNumber': ['POL-EXAMPLE-001'],
-                'ClaimType': ['Auto'],
-                'SupportingDocs': ['document1.pdf, document2.pdf'],
-                'ContactEmail': ['example@email.com'],
-                'Location': ['40.7128,-74.0060'],
-                'MedicalCodes': ['ICD-10:S72.8X1A'],
-                'TransactionHashes': ['0xabc123...']
-            }
-            
-            df = pd.DataFrame(template_data)
-            df.to_excel(template_path, index=False)
+        content, etag = template_bytes()
+        headers = {"ETag": etag, "Cache-Control": "public, max-age=86400"}
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=headers)
         
-        return FileResponse(
-            path=template_path,
-            filename="claims_template.xlsx",
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
+        headers["Content-Disposition"] = 'attachment; filename="claims_template.xlsx"'
+        return Response(content=content, media_type=XLSX_MEDIA_TYPE, headers=headers)
         
     except Exception as e:
         logger.error(f"Error downloading template: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Serve the frontend build (only if it exists). Mounted last: a mount at "/" matches
+# every path, so any route registered after it would be unreachable.
+frontend_build_path = "../frontend/build"
+
+class SPAStaticFiles(StaticFiles):
+    """Build directory server that falls back to index.html for client-side routes"""
+
+    async def get_response(self, path: str, scope):
+        try:
+            response = await super().get_response(path, scope)
+        except StarletteHTTPException as e:
+            if e.status_code != 404:
+                raise
+            response = await super().get_response("index.html", scope)
+            path = "index.html"
+        # CRA fingerprints everything under static/, so those never change
+        if path.startswith("static/"):
+            response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        else:
+            response.headers["Cache-Control"] = "no-cache"
+        return response
+
+if os.path.exists(frontend_build_path):
+    app.mount("/", SPAStaticFiles(directory=frontend_build_path, html=True), name="frontend")
+else:
+    @app.get("/frontend-status")
+    async def frontend_status():
+        return {"message": "Frontend not built yet. Run 'npm run build' in the frontend directory."}
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # uvloop and httptools ship with uvicorn[standard] but have no Windows builds.
+    # Default to one worker unless REDIS_URL is set: without it batch_tasks and the
+    # connection manager live in process memory. For production, e.g.
+    #   gunicorn -k uvicorn.workers.UvicornWorker -w $((2*$(nproc)+1)) main:app
+    server_options = {"loop": "uvloop", "http": "httptools"} if sys.platform != "win32" else {}
+    workers = int(os.getenv("UVICORN_WORKERS", "4" if REDIS_URL else "1"))
+    # Access logging formats and writes a line per request; opt back in with UVICORN_ACCESS_LOG=1
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=workers, ws="websockets",
+                ws_ping_interval=20, ws_ping_timeout=20, access_log=os.getenv("UVICORN_ACCESS_LOG") == "1",
+                log_level=os.getenv("UVICORN_LOG_LEVEL", "warning"), **server_options)
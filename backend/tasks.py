@@ -0,0 +1,116 @@
+"""Celery worker for Excel batches
+
+Run with: celery -A tasks worker --concurrency=$(nproc) -P prefork
+Workers share task state and progress with the API through the same Redis
+hashes and ws:{task_id} channels the API uses, so clients see no difference.
+"""
+import os
+import sys
+import time
+import logging
+from datetime import datetime
+from typing import Optional
+import orjson
+import redis
+from celery import Celery
+from dotenv import load_dotenv
+
+load_dotenv()
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from agents_excel import CorgiAgentSystem
+from batch_store import CHANNEL_PREFIX, DIGEST_PREFIX, TASK_PREFIX, TASK_TTL, encode_fields
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+celery_app = Celery(
+    "corgi",
+    broker=os.getenv("CELERY_BROKER_URL", REDIS_URL),
+    backend=os.getenv("CELERY_RESULT_BACKEND", REDIS_URL)
+)
+celery_app.conf.task_acks_late = True  # Requeue batches whose worker dies mid-run
+# Redis redelivers unacked tasks after the visibility timeout (1 hour by default),
+# so it must outlast the longest batch or a running one is started again
+CELERY_VISIBILITY_TIMEOUT = int(os.getenv("CELERY_VISIBILITY_TIMEOUT", str(TASK_TTL)))
+celery_app.conf.broker_transport_options = {"visibility_timeout": CELERY_VISIBILITY_TIMEOUT}
+
+_redis = redis.Redis.from_url(REDIS_URL)
+_fraud_system = None
+
+def get_fraud_system() -> CorgiAgentSystem:
+    """One agent system per worker process, built on first use"""
+    global _fraud_system
+    if _fraud_system is None:
+        _fraud_system = CorgiAgentSystem()
+    return _fraud_system
+
+def _update_task(task_id: str, **fields):
+    key = TASK_PREFIX + task_id
+    with _redis.pipeline(transaction=True) as pipe:
+        pipe.hset(key, mapping=encode_fields(fields))
+        pipe.expire(key, TASK_TTL)
+        pipe.execute()
+
+def _task_field(task_id: str, field: str):
+    value = _redis.hget(TASK_PREFIX + task_id, field)
+    return orjson.loads(value) if value is not None else None
+
+def _publish(task_id: str, data: dict):
+    data = {"task_id": task_id, "timestamp": datetime.now().isoformat(timespec="seconds"), **data}
+    _redis.publish(CHANNEL_PREFIX + task_id, orjson.dumps(data, default=str))
+
+@celery_app.task(name="corgi.process_excel")
+def process_excel_task(task_id: str, file_path: str, digest: Optional[str] = None) -> str:
+    """Process an uploaded workbook, reporting progress like the in-process background task"""
+    def progress_cb(pct: int, message: str):
+        progress = 20 + pct * 75 // 100
+        _update_task(task_id, progress=progress)
+        _publish(task_id, {"type": "progress", "status": "processing", "progress": progress, "message": message})
+
+    try:
+        # A redelivered batch that already finished must not rerun or overwrite its result
+        if _task_field(task_id, "status") == "completed":
+            logger.info(f"Batch {task_id} already completed, skipping redelivery")
+            return _task_field(task_id, "output_path")
+        
+        _update_task(task_id, status="processing", progress=20)
+        start_time = time.time()
+        output_path = get_fraud_system().process_excel(file_path, progress_cb=progress_cb)
+        processing_time = time.time() - start_time
+
+        _update_task(
+            task_id,
+            status="completed",
+            output_path=output_path,
+            completed_at=datetime.now().isoformat(),
+            progress=100,
+            processing_time=processing_time
+        )
+        _publish(task_id, {
+            "type": "completed",
+            "status": "completed",
+            "progress": 100,
+            "message": "Batch processing completed successfully!",
+            "processing_time": f"{processing_time:.2f} seconds",
+            "output_path": output_path
+        })
+        if digest:
+            # Lets the API reuse these results for an identical upload
+            _redis.set(DIGEST_PREFIX + digest, task_id, ex=TASK_TTL)
+        return output_path
+
+    except Exception as e:
+        logger.error(f"Error processing Excel file {task_id}: {e}")
+        _update_task(task_id, status="failed", error=str(e), completed_at=datetime.now().isoformat())
+        _publish(task_id, {"type": "error", "status": "failed", "error": str(e)})
+        raise
+
+    finally:
+        # The upload only exists on disk so this worker could read it
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
@@ -76,46 +76,50 @@ const useWebSocket = (taskId) => {
 
       newSocket.onmessage = (event) => {
         try {
-          const data = JSON.parse(event.data);
-          setLastMessage(data);
+          const parsed = JSON.parse(event.data);
+          // Updates sent close together arrive as one array frame
+          const updates = Array.isArray(parsed) ? parsed : [parsed];
+          setLastMessage(updates[updates.length - 1]);
           
-          // Handle different message types
-          switch (data.type) {
-            case 'connection_established':
-              addLog(data.message, 'success');
-              break;
+          updates.forEach((data) => {
+            // Handle different message types
+            switch (data.type) {
+              case 'connection_established':
+                addLog(data.message, 'success');
+                break;
               
-            case 'heartbeat':
-              // Don't log heartbeat messages as they're just keepalive
-              break;
+              case 'heartbeat':
+                // Don't log heartbeat messages as they're just keepalive
+                break;
               
-            case 'progress':
-              setProgress(data.progress || 0);
-              setStatus(data.status || '');
-              setCurrentStep(data.message || '');
-              addLog(`${data.progress}% - ${data.message}`, 'info');
-              break;
+              case 'progress':
+                setProgress(data.progress || 0);
+                setStatus(data.status || '');
+                setCurrentStep(data.message || '');
+                addLog(`${data.progress}% - ${data.message}`, 'info');
+                break;
               
-            case 'completed':
-              setProgress(100);
-              setStatus('completed');
-              setCurrentStep(data.message || 'Processing completed');
-              addLog(`✅ ${data.message}`, 'success');
-              if (data.processing_time) {
-                addLog(`Processing completed in ${data.processing_time}`, 'info');
-              }
-              break;
+              case 'completed':
+                setProgress(100);
+                setStatus('completed');
+                setCurrentStep(data.message || 'Processing completed');
+                addLog(`✅ ${data.message}`, 'success');
+                if (data.processing_time) {
+                  addLog(`Processing completed in ${data.processing_time}`, 'info');
+                }
+                break;
               
-            case 'error':
-              setError(data.error || 'Unknown error occurred');
-              setStatus('failed');
-              setCurrentStep(`Error: ${data.error}`);
-              addLog(`❌ Error: ${data.error}`, 'error');
-              break;
+              case 'error':
+                setError(data.error || 'Unknown error occurred');
+                setStatus('failed');
+                setCurrentStep(`Error: ${data.error}`);
+                addLog(`❌ Error: ${data.error}`, 'error');
+                break;
               
-            default:
-              addLog(`Received: ${data.message || JSON.stringify(data)}`, 'info');
-          }
+              default:
+                addLog(`Received: ${data.message || JSON.stringify(data)}`, 'info');
+            }
+          });
         } catch (err) {
           console.error('Error parsing WebSocket message:', err);
           addLog('Error parsing server message', 'error');
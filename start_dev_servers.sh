@@ -7,7 +7,7 @@ echo "🐕 Starting Corgi Fraud Detection System..."
 # Start backend server
 echo "Starting backend server..."
 cd backend
-python -m uvicorn main:app --reload --host 0.0.0.0 --port 8000 &
+python -m uvicorn main:app --reload --host 0.0.0.0 --port 8000 --loop uvloop --http httptools --ws websockets --ws-ping-interval 20 --ws-ping-timeout 20 &
 BACKEND_PID=$!
 
 # Wait for backend to start
@@ -1,16 +1,27 @@
 import pandas as pd
 import numpy as np
 import random
-from datetime import datetime, timedelta
+from datetime import datetime
 from faker import Faker
-import uuid
-import openpyxl
-from openpyxl.styles import Font, PatternFill
-import json
+import re
+import orjson
+import xlsxwriter
+import asyncio
+import hashlib
+import inspect
+import statistics
+from functools import lru_cache
 from typing import Dict, List, Optional
-from autogen import AssistantAgent, UserProxyAgent, config_list_from_json
+from cachetools import TTLCache
 fake = Faker()
 import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import diskcache
+except ImportError:
+    diskcache = None
 
 class FraudDetectionConfig:
     """Configuration for advanced fraud detection system"""
@@ -36,6 +47,29 @@ class FraudDetectionConfig:
         "timeout": 180,
         "temperature": 0.2
     }
+    
+    # Specialists return structured scores, which a small model handles at a fraction of the cost
+    MINI_CONFIG = {
+        "config_list": [
+            {
+                "model": "gpt-4o-mini",
+                "api_key": os.getenv("OPENAI_API_KEY")
+            }
+        ],
+        "timeout": 120,
+        "temperature": 0.0,
+        "seed": 42
+    }
+    
+    @staticmethod
+    def for_agent(config: dict, agent_name: str) -> dict:
+        """config with a per-agent prompt_cache_key, so every call sharing a system prompt is
+        routed to the same provider-side prefix cache (sent via extra_body for older SDKs)"""
+        return {**config, "extra_body": {"prompt_cache_key": f"corgi-{agent_name}"}}
+    
+    MAX_CONCURRENT_AGENTS = 8  # Specialist chats in flight at once, to stay within rate limits
+    # Specialist scores spread wider than this (std dev) get their outliers re-run on GPT-4
+    ESCALATION_STDDEV = 0.25
 # Enhanced fraud patterns with agent-specific triggers
 FRAUD_PATTERNS = {
     'social_media_fraud': {
@@ -79,23 +113,72 @@ FRAUD_PATTERNS = {
         'geospatial_flags': ['impossible_travel']
     }
 }
+FRAUD_PATTERN_VALUES = tuple(FRAUD_PATTERNS.values())
+
+class ResponseCache:
+    """Agent responses keyed by model, agent and payload; in memory, plus on disk if FRAUD_CACHE_DIR is set"""
+    
+    def __init__(self, maxsize: int = 10_000, ttl: int = 3600, directory: Optional[str] = None):
+        self.memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.ttl = ttl
+        directory = directory or os.getenv("FRAUD_CACHE_DIR")
+        self.disk = diskcache.Cache(directory) if directory and diskcache else None
+        self.stats = {"hits": 0, "misses": 0}
+    
+    @staticmethod
+    def key(model: str, agent_name: str, data: dict) -> str:
+        payload = orjson.dumps(data, option=orjson.OPT_SORT_KEYS | orjson.OPT_SERIALIZE_NUMPY, default=str)
+        return hashlib.sha256(f"{model}\0{agent_name}\0".encode() + payload).hexdigest()
+    
+    def get(self, key: str) -> Optional[dict]:
+        result = self.memory.get(key)
+        if result is None and self.disk is not None:
+            result = self.disk.get(key)
+            if result is not None:
+                self.memory[key] = result
+        self.stats["hits" if result is not None else "misses"] += 1
+        return result
+    
+    def set(self, key: str, result: dict):
+        self.memory[key] = result
+        if self.disk is not None:
+            self.disk.set(key, result, expire=self.ttl)
+
+# Specialist agent -> the claim_data section it analyzes
+SPECIALIST_INPUTS = {
+    "social": "social_media",
+    "network": "network_analysis",
+    "blockchain": "blockchain",
+    "medical": "medical_data",
+    "geospatial": "location_data"
+}
 
 class AdvancedFraudAgents:
-    def __init__(self):
+    def __init__(self, cache: Optional[ResponseCache] = None):
+        # autogen is imported here so pure data generation never loads it
+        from autogen import UserProxyAgent
         self.agents = self._initialize_agents()
-        self.user_proxy = UserProxyAgent(
-            name="Admin",
-            human_input_mode="NEVER",
-            max_consecutive_auto_reply=10,
-            code_execution_config=False
-        )
+        self.escalation_agents = {}
+        self.cache = cache or ResponseCache()
+        self.cache_stats = self.cache.stats
+        # One proxy per agent: chats run concurrently and a proxy keeps per-chat state
+        self.user_proxies = {
+            name: UserProxyAgent(
+                name=f"Admin_{name}",
+                human_input_mode="NEVER",
+                max_consecutive_auto_reply=10,
+                code_execution_config=False
+            )
+            for name in self.agents
+        }
     
-    def _initialize_agents(self) -> Dict[str, AssistantAgent]:
+    def _initialize_agents(self) -> Dict[str, "AssistantAgent"]:
         """Initialize the complete set of advanced analysis agents"""
+        from autogen import AssistantAgent
         agents = {
             "social": AssistantAgent(
                 name="SocialAnalystPro",
-                system_message="""Analyze social media for fraud indicators:
+                system_message=inspect.cleandoc("""Analyze social media for fraud indicators:
                 - Post/claim timeline analysis
                 - Geolocation verification
                 - Sentiment inconsistency
@@ -120,12 +203,12 @@ class AdvancedFraudAgents:
                         "deepfake_indicators": float
                     },
                     "recommendations": [...]
-                }""",
-                llm_config=FraudDetectionConfig.LLM_CONFIG
+                }"""),
+                llm_config=FraudDetectionConfig.for_agent(FraudDetectionConfig.MINI_CONFIG, "social")
             ),
             "network": AssistantAgent(
                 name="NetworkThreatIntel",
-                system_message="""Examine network patterns for anomalies:
+                system_message=inspect.cleandoc("""Examine network patterns for anomalies:
                 - IP reputation analysis
                 - Device fingerprinting
                 - Behavioral biometrics
@@ -148,12 +231,12 @@ class AdvancedFraudAgents:
                         "cluster_coefficient": float
                     },
                     "tor_usage": bool
-                }""",
-                llm_config=FraudDetectionConfig.LLM_CONFIG
+                }"""),
+                llm_config=FraudDetectionConfig.for_agent(FraudDetectionConfig.MINI_CONFIG, "network")
             ),
             "blockchain": AssistantAgent(
                 name="BlockchainForensics",
-                system_message="""Analyze blockchain transactions:
+                system_message=inspect.cleandoc("""Analyze blockchain transactions:
                 - Wallet transaction graph
                 - Smart contract interactions
                 - Mixer/tumbler detection
@@ -179,12 +262,12 @@ class AdvancedFraudAgents:
                         "path": [...]
                     },
                     "recommendations": [...]
-                }""",
-                llm_config=FraudDetectionConfig.LLM_CONFIG
+                }"""),
+                llm_config=FraudDetectionConfig.for_agent(FraudDetectionConfig.MINI_CONFIG, "blockchain")
             ),
             "medical": AssistantAgent(
                 name="MedicalClaimsExpert",
-                system_message="""Evaluate medical claims:
+                system_message=inspect.cleandoc("""Evaluate medical claims:
                 - Procedure-code consistency
                 - Treatment duration analysis
                 - Provider reputation
@@ -208,12 +291,12 @@ class AdvancedFraudAgents:
                         "sanction_history": [...]
                     },
                     "clinical_plausibility": 0-1
-                }""",
-                llm_config=FraudDetectionConfig.LLM_CONFIG
+                }"""),
+                llm_config=FraudDetectionConfig.for_agent(FraudDetectionConfig.MINI_CONFIG, "medical")
             ),
             "geospatial": AssistantAgent(
                 name="GeospatialAnalyst",
-                system_message="""Verify geospatial claims:
+                system_message=inspect.cleandoc("""Verify geospatial claims:
                 - Location verification
                 - Weather correlation
                 - Traffic/accident data
@@ -242,12 +325,12 @@ class AdvancedFraudAgents:
                         "vpn_proxy": bool,
                         "location_mismatch": bool
                     }
-                }""",
-                llm_config=FraudDetectionConfig.LLM_CONFIG
+                }"""),
+                llm_config=FraudDetectionConfig.for_agent(FraudDetectionConfig.MINI_CONFIG, "geospatial")
             ),
             "decision": AssistantAgent(
                 name="DecisionEnginePro",
-                system_message="""Make final claim determination:
+                system_message=inspect.cleandoc("""Make final claim determination:
                 1. Aggregate agent findings with weighted scoring
                 2. Apply business rules and regulatory requirements
                 3. Evaluate fraud probability using ensemble methods
@@ -277,68 +360,182 @@ class AdvancedFraudAgents:
                         "requirements_met": [...],
                         "potential_violations": [...]
                     }
-                }""",
-                llm_config=FraudDetectionConfig.GPT4_CONFIG
+                }"""),
+                llm_config=FraudDetectionConfig.for_agent(FraudDetectionConfig.GPT4_CONFIG, "decision")
             )
         }
         return agents
 
     def analyze_claim(self, claim_data: dict) -> dict:
         """Orchestrate multi-agent fraud analysis"""
-        analysis_results = {}
+        return asyncio.run(self.analyze_claim_async(claim_data))
+
+    async def analyze_claim_async(self, claim_data: dict) -> dict:
+        """Run the specialist agents concurrently, then the decision agent on their findings"""
+        semaphore = asyncio.Semaphore(FraudDetectionConfig.MAX_CONCURRENT_AGENTS)
+        results = await asyncio.gather(*(
+            self._analyze_with_agent_async(name, claim_data.get(key, {}), semaphore)
+            for name, key in SPECIALIST_INPUTS.items()
+        ), return_exceptions=True)
+        analysis_results = {
+            name: {"error": str(result)} if isinstance(result, BaseException) else result
+            for name, result in zip(SPECIALIST_INPUTS, results)
+        }
         
-        # Parallel agent analysis
-        analysis_results["social"] = self._analyze_with_agent(
-            "social", claim_data.get("social_media", {})
-        )
-        analysis_results["network"] = self._analyze_with_agent(
-            "network", claim_data.get("network_analysis", {})
-        )
-        analysis_results["blockchain"] = self._analyze_with_agent(
-            "blockchain", claim_data.get("blockchain", {})
-        )
-        analysis_results["medical"] = self._analyze_with_agent(
-            "medical", claim_data.get("medical_data", {})
-        )
-        analysis_results["geospatial"] = self._analyze_with_agent(
-            "geospatial", claim_data.get("location_data", {})
-        )
+        # When the specialists disagree, get a GPT-4 second opinion from the outliers only
+        scores = {name: result["score"] for name, result in analysis_results.items()
+                  if isinstance(result.get("score"), (int, float))}
+        if len(scores) > 1 and statistics.pstdev(scores.values()) > FraudDetectionConfig.ESCALATION_STDDEV:
+            median = statistics.median(scores.values())
+            outliers = [name for name, score in scores.items()
+                        if abs(score - median) > FraudDetectionConfig.ESCALATION_STDDEV]
+            escalated = await asyncio.gather(*(
+                self._analyze_with_agent_async(name, claim_data.get(SPECIALIST_INPUTS[name], {}), semaphore,
+                                               self._escalation_agent(name))
+                for name in outliers
+            ))
+            analysis_results.update(
+                (name, result) for name, result in zip(outliers, escalated) if "error" not in result
+            )
         
         # Decision engine processing
         decision_input = {
             "claim_details": claim_data,
             "agent_findings": analysis_results
         }
-        final_decision = self._analyze_with_agent("decision", decision_input)
+        final_decision = await self._analyze_with_agent_async("decision", decision_input, semaphore)
         
         return {
             "analysis_results": analysis_results,
             "final_decision": final_decision
         }
 
-    def _analyze_with_agent(self, agent_name: str, data: dict) -> dict:
-        """Execute analysis with a specific agent"""
+    def _escalation_agent(self, agent_name: str) -> "AssistantAgent":
+        """GPT-4 twin of a specialist, built the first time one of its verdicts is escalated"""
+        if agent_name not in self.escalation_agents:
+            from autogen import AssistantAgent
+            agent = self.agents[agent_name]
+            self.escalation_agents[agent_name] = AssistantAgent(
+                name=f"{agent.name}Escalation",
+                system_message=agent.system_message,
+                llm_config=FraudDetectionConfig.for_agent(FraudDetectionConfig.GPT4_CONFIG, agent_name)
+            )
+        return self.escalation_agents[agent_name]
+
+    async def _analyze_with_agent_async(self, agent_name: str, data: dict,
+                                        semaphore: asyncio.Semaphore, agent=None) -> dict:
+        """Execute analysis with a specific agent (or an override such as its escalation twin)"""
+        agent = agent or self.agents[agent_name]
+        proxy = self.user_proxies[agent_name]
+        # Generated payloads repeat often (few patterns, few flags), so identical ones skip the LLM
+        cache_key = self.cache.key(agent.llm_config["config_list"][0]["model"], agent_name, data)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
         try:
-            self.user_proxy.initiate_chat(
-                self.agents[agent_name],
-                message=json.dumps(data, indent=2))
+            async with semaphore:
+                # Compact orjson output: the LLM gains nothing from indentation
+                await proxy.a_initiate_chat(agent, message=orjson.dumps(
+                    data, option=orjson.OPT_SERIALIZE_NUMPY, default=str).decode())
             
-            last_message = self.user_proxy.chat_messages[self.agents[agent_name]][-1]
-            return json.loads(last_message["content"])
+            last_message = proxy.chat_messages[agent][-1]
+            result = orjson.loads(last_message["content"])
+            self.cache.set(cache_key, result)
+            return result
         except Exception as e:
             print(f"Error in {agent_name} analysis: {str(e)}")
             return {"error": str(e)}
 
-def generate_claim_metadata(is_fraud: bool, pattern: dict = None) -> dict:
+FAKER_POOL_SIZE = 1000  # Distinct values per Faker provider, sampled from instead of one Faker call per use
+FAKER_PROVIDERS = {
+    'name': fake.name,
+    'word': fake.word,
+    'company': fake.company,
+    'sentence': fake.sentence,
+    'paragraph': lambda: fake.paragraph(nb_sentences=3),
+    'user_agent': fake.user_agent,
+    'ipv4': fake.ipv4,
+    'sha1': fake.sha1,
+    'address': fake.address,
+    'country': fake.country,
+    'coordinates': lambda: (float(fake.latitude()), float(fake.longitude())),
+    'date_this_year': lambda: fake.date_this_year().strftime('%Y-%m-%d'),
+    'claim_date': lambda: fake.date_between(start_date='-1y', end_date='today').strftime('%B %d, %Y'),
+    'time': lambda: fake.time(pattern='%I:%M %p'),
+    'cpt_code': lambda: fake.bothify(text='CPT-####'),
+    'report_number': lambda: fake.bothify(text='#######')
+}
+
+@lru_cache(maxsize=None)
+def faker_pool(kind: str) -> tuple:
+    """FAKER_POOL_SIZE values from one Faker provider, generated on first use"""
+    return tuple(FAKER_PROVIDERS[kind]() for _ in range(FAKER_POOL_SIZE))
+
+_faker_pool_seed = None
+
+def seed_faker_pools(pool_seed: int):
+    """Rebuild every Faker pool from pool_seed unless this process already built them from it"""
+    global _faker_pool_seed
+    if _faker_pool_seed != pool_seed:
+        fake.seed_instance(pool_seed)
+        faker_pool.cache_clear()
+        for kind in FAKER_PROVIDERS:
+            faker_pool(kind)
+        _faker_pool_seed = pool_seed
+
+def fake_pick(kind: str):
+    return random.choice(faker_pool(kind))
+
+DEVICE_TYPES = ['mobile', 'desktop', 'tablet']
+SOCIAL_PLATFORMS = ['facebook', 'twitter', 'instagram', 'linkedin']
+FLAG_CATEGORIES = ['social_media_flags', 'network_flags', 'blockchain_flags', 'medical_flags', 'geospatial_flags']
+MAX_PATTERN_FLAGS = max(len(p[c]) for p in FRAUD_PATTERN_VALUES for c in FLAG_CATEGORIES)
+
+def pick_flags(flags: list, order: List[int], k: int) -> list:
+    """Up to k of flags in a pre-drawn random order, i.e. a sample without replacement"""
+    return [flags[i] for i in order if i < len(flags)][:k]
+
+def sample_numeric_fields(rng: np.random.Generator, n: int) -> List[dict]:
+    """Draw the fixed-shape numeric metadata fields and sampling orders for n claims in one pass per field"""
+    fields = {
+        # argsort of uniform draws gives an independent random permutation per row
+        'device_order': rng.random((n, len(DEVICE_TYPES))).argsort(axis=1),
+        'device_count': rng.integers(1, len(DEVICE_TYPES) + 1, n),
+        'platform_order': rng.random((n, len(SOCIAL_PLATFORMS))).argsort(axis=1)[:, :2],
+        'flag_order': rng.random((n, len(FLAG_CATEGORIES), MAX_PATTERN_FLAGS)).argsort(axis=2),
+        'claimant_age': rng.integers(18, 81, n),
+        'policy_age_days': rng.integers(30, 365*5 + 1, n),
+        'previous_claims': rng.integers(0, 6, n),
+        'credit_score': rng.integers(300, 851, n),
+        'post_frequency': rng.integers(1, 21, n),
+        'sentiment_positive': rng.uniform(0, 0.3, n),
+        'sentiment_negative': rng.uniform(0.4, 0.9, n),
+        'connections': rng.integers(5, 51, n),
+        'fraud_connections': rng.integers(1, 6, n),
+        'typing_speed': rng.uniform(20, 80, n),
+        'mouse_movement': rng.uniform(0.1, 0.9, n),
+        'transactions': rng.integers(1, 101, n),
+        'timing_anomalies': rng.random(n) > 0.7,
+        'report_delay_days': rng.integers(30, 181, n),
+        'weekend_claim': rng.random(n) < 0.5,
+        'holiday_claim': rng.random(n) < 0.5,
+        'timezone_hopping': rng.random(n) < 0.5
+    }
+    # tolist() hands back Python scalars, which the JSON encoders accept as-is
+    return [dict(zip(fields, row)) for row in zip(*(values.tolist() for values in fields.values()))]
+
+def generate_claim_metadata(is_fraud: bool, pattern: dict = None, numeric: Optional[dict] = None) -> dict:
     """Generate metadata with agent-specific detection triggers"""
+    if numeric is None:
+        numeric = sample_numeric_fields(np.random.default_rng(), 1)[0]
     metadata = {
-        'claimant_age': random.randint(18, 80),
-        'policy_age_days': random.randint(30, 365*5),
-        'previous_claims': random.randint(0, 5),
-        'credit_score': random.randint(300, 850),
+        'claimant_age': numeric['claimant_age'],
+        'policy_age_days': numeric['policy_age_days'],
+        'previous_claims': numeric['previous_claims'],
+        'credit_score': numeric['credit_score'],
         'digital_footprint': {
-            'device_types': random.sample(['mobile', 'desktop', 'tablet'], random.randint(1, 3)),
-            'os_versions': [fake.user_agent() for _ in range(random.randint(1, 2))]
+            'device_types': [DEVICE_TYPES[i] for i in numeric['device_order'][:numeric['device_count']]],
+            'os_versions': [fake_pick('user_agent') for _ in range(random.randint(1, 2))]
         }
     }
     
@@ -346,42 +543,39 @@ def generate_claim_metadata(is_fraud: bool, pattern: dict = None) -> dict:
         # Add social media red flags
         if pattern['social_media_flags']:
             metadata['social_media'] = {
-                'platforms': random.sample(['facebook', 'twitter', 'instagram', 'linkedin'], 2),
-                'flags': random.sample(pattern['social_media_flags'], 
-                              min(2, len(pattern['social_media_flags']))),
-                'last_active': fake.date_this_year().strftime('%Y-%m-%d'),
-                'post_frequency': random.randint(1, 20),
+                'platforms': [SOCIAL_PLATFORMS[i] for i in numeric['platform_order']],
+                'flags': pick_flags(pattern['social_media_flags'], numeric['flag_order'][0], 2),
+                'last_active': fake_pick('date_this_year'),
+                'post_frequency': numeric['post_frequency'],
                 'sentiment_analysis': {
-                    'positive': random.uniform(0, 0.3),
-                    'negative': random.uniform(0.4, 0.9)
+                    'positive': numeric['sentiment_positive'],
+                    'negative': numeric['sentiment_negative']
                 }
             }
         
         # Add network analysis flags
         if pattern['network_flags']:
             metadata['network_analysis'] = {
-                'connections': random.randint(5, 50),
-                'fraud_connections': random.randint(1, 5),
-                'flags': random.sample(pattern['network_flags'], 
-                               min(2, len(pattern['network_flags']))),
-                'ip_addresses': [fake.ipv4() for _ in range(random.randint(1, 3))],
+                'connections': numeric['connections'],
+                'fraud_connections': numeric['fraud_connections'],
+                'flags': pick_flags(pattern['network_flags'], numeric['flag_order'][1], 2),
+                'ip_addresses': [fake_pick('ipv4') for _ in range(random.randint(1, 3))],
                 'behavioral_biometrics': {
-                    'typing_speed': random.uniform(20, 80),
-                    'mouse_movement': random.uniform(0.1, 0.9)
+                    'typing_speed': numeric['typing_speed'],
+                    'mouse_movement': numeric['mouse_movement']
                 }}
             
         
         # Add blockchain data for crypto-related fraud
         if pattern['blockchain_flags']:
             metadata['blockchain'] = {
-                'wallets': [f"0x{fake.sha1()[:40]}" for _ in range(random.randint(1, 3))],
-                'transactions': random.randint(1, 100),
-                'flags': random.sample(pattern['blockchain_flags'], 
-                              min(2, len(pattern['blockchain_flags']))),
+                'wallets': ["0x" + fake_pick('sha1') for _ in range(random.randint(1, 3))],
+                'transactions': numeric['transactions'],
+                'flags': pick_flags(pattern['blockchain_flags'], numeric['flag_order'][2], 2),
                 'token_movements': [
                     {
-                        'from': f"0x{fake.sha1()[:40]}",
-                        'to': f"0x{fake.sha1()[:40]}",
+                        'from': "0x" + fake_pick('sha1'),
+                        'to': "0x" + fake_pick('sha1'),
                         'amount': random.uniform(0.1, 50),
                         'token': random.choice(['ETH', 'BTC', 'USDT'])
                     } for _ in range(random.randint(1, 5))
@@ -391,270 +585,327 @@ def generate_claim_metadata(is_fraud: bool, pattern: dict = None) -> dict:
         # Add medical data for healthcare fraud
         if pattern['medical_flags']:
             metadata['medical_data'] = {
-                'provider': fake.company(),
+                'provider': fake_pick('company'),
                 'procedures': [
                     {
-                        'code': fake.bothify(text='CPT-####'),
-                        'date': fake.date_this_year().strftime('%Y-%m-%d'),
+                        'code': fake_pick('cpt_code'),
+                        'date': fake_pick('date_this_year'),
                         'cost': random.uniform(100, 5000)
                     } for _ in range(random.randint(1, 5))
                 ],
-                'flags': random.sample(pattern['medical_flags'], 
-                              min(2, len(pattern['medical_flags'])))
+                'flags': pick_flags(pattern['medical_flags'], numeric['flag_order'][3], 2)
             }
         
         # Add geospatial data
         if pattern['geospatial_flags']:
             metadata['location_data'] = {
                 'claimed_location': {
-                    'address': fake.address(),
-                    'coordinates': [float(fake.latitude()), float(fake.longitude())]
+                    'address': fake_pick('address'),
+                    'coordinates': fake_pick('coordinates')
                 },
                 'ip_locations': [
                     {
-                        'ip': fake.ipv4(),
-                        'country': fake.country(),
+                        'ip': fake_pick('ipv4'),
+                        'country': fake_pick('country'),
                         'vpn': random.choice([True, False])
                     } for _ in range(random.randint(1, 3))
                 ],
-                'flags': random.sample(pattern['geospatial_flags'], 
-                              min(1, len(pattern['geospatial_flags'])))
+                'flags': pick_flags(pattern['geospatial_flags'], numeric['flag_order'][4], 1)
             }
         
         # Add timing anomalies
-        if random.random() > 0.7:
+        if numeric['timing_anomalies']:
             metadata['timing_anomalies'] = {
-                'report_delay_days': random.randint(30, 180),
-                'weekend_claim': random.choice([True, False]),
-                'holiday_claim': random.choice([True, False]),
-                'timezone_hopping': random.choice([True, False])
+                'report_delay_days': numeric['report_delay_days'],
+                'weekend_claim': numeric['weekend_claim'],
+                'holiday_claim': numeric['holiday_claim'],
+                'timezone_hopping': numeric['timezone_hopping']
             }
     
     return metadata
 
+BASE_INCIDENTS = {
+    'vehicle': ['collision', 'hit-and-run', 'theft', 'vandalism'],
+    'property': ['burglary', 'fire', 'flood', 'storm damage'],
+    'health': ['injury', 'illness', 'disability', 'medical emergency'],
+    'cyber': ['hacking', 'data breach', 'crypto theft', 'identity theft'],
+    'travel': ['trip cancellation', 'lost luggage', 'medical evacuation']
+}
+BASE_INCIDENT_KEYS = tuple(BASE_INCIDENTS)
+
+# Sophisticated inconsistencies planted in fraudulent narratives
+INCONSISTENCIES = [
+    ("timeline", "I was actually out of town that week but the incident occurred"),
+    ("location", "The GPS data shows I was elsewhere during the claimed time"),
+    ("document", "The receipts appear altered when examined closely"),
+    ("witness", "The witness provided conflicting statements upon re-interview"),
+    ("medical", "The treatment records don't match the claimed injuries")
+]
+
+FRAUD_CLAIM_TEMPLATE = (
+    "On {date}, I experienced {incident} while {activity}. "
+    "The incident occurred when {sentence} "
+    # Pattern-specific narrative elements and deliberate inconsistencies
+    "{keyword} has complicated matters because {sentence2}. "
+    "{inconsistencies} "
+    "I immediately {action}, though {delay}. "
+    "Supporting documents include {documents}, but {document_issue}. "
+    "Additional context: {paragraph} "
+    "{keyword2} further complicates this because {sentence3}"
+)
+FRAUD_CHOICES = {
+    'activity': ['traveling', 'working', 'at home', 'on vacation'],
+    'action': ['contacted authorities', 'took photos', 'sought medical attention', 'notified my insurance agent'],
+    'delay': ['there was some delay', 'the response was slow', 'documentation was incomplete'],
+    'documents': ['photographs', 'receipts', 'medical records', 'police reports'],
+    'document_issue': ['some are difficult to read', 'a few are missing dates', 'the originals were lost']
+}
+
+LEGIT_CLAIM_TEMPLATE = (
+    "On {date}, I experienced {incident} while {activity}. "
+    "The incident occurred at precisely {time} when {sentence}. "
+    "I immediately {action} and {sentence2}. "
+    "Independent verification includes {verification}. "
+    "All documentation is complete and consistent, including {documentation}. "
+    "Additional details: {paragraph}"
+)
+LEGIT_CHOICES = {
+    'activity': ['driving to work', 'at home', 'traveling abroad', 'at the office'],
+    'action': ['called 911', 'contacted my insurance agent', 'documented the scene with photos', 'sought medical attention'],
+    'documentation': ['dated photographs', 'itemized receipts', 'signed witness statements', 'official reports']
+}
+# Verification source prefix -> Faker pool completing it; only the chosen one is drawn
+VERIFICATION_SOURCES = [
+    ('police report #', 'report_number'),
+    ('security footage from ', 'company'),
+    ('witness statements from ', 'name'),
+    ('medical records from ', 'company')
+]
+
+MIN_CLAIM_WORDS = 100
+WHITESPACE_RE = re.compile(r'\s+')
+
 def generate_detailed_claim_text(is_fraud: bool, pattern: dict = None) -> str:
     """Generate realistic claim text with embedded fraud signals"""
-    
-    base_incidents = {
-        'vehicle': ['collision', 'hit-and-run', 'theft', 'vandalism'],
-        'property': ['burglary', 'fire', 'flood', 'storm damage'],
-        'health': ['injury', 'illness', 'disability', 'medical emergency'],
-        'cyber': ['hacking', 'data breach', 'crypto theft', 'identity theft'],
-        'travel': ['trip cancellation', 'lost luggage', 'medical evacuation']
+    fields = {
+        'date': fake_pick('claim_date'),
+        'incident': random.choice(BASE_INCIDENTS[random.choice(BASE_INCIDENT_KEYS)]),
+        'sentence': fake_pick('sentence'),
+        'sentence2': fake_pick('sentence'),
+        'paragraph': fake_pick('paragraph')
     }
     
     if is_fraud:
-        incident_type = random.choice(list(base_incidents.keys()))
-        
-        # Create sophisticated inconsistencies
-        inconsistencies = [
-            ("timeline", "I was actually out of town that week but the incident occurred"),
-            ("location", "The GPS data shows I was elsewhere during the claimed time"),
-            ("document", "The receipts appear altered when examined closely"),
-            ("witness", "The witness provided conflicting statements upon re-interview"),
-            ("medical", "The treatment records don't match the claimed injuries")
-        ]
-        
-        selected_inconsistencies = random.sample(inconsistencies, k=min(3, len(inconsistencies)))
-        
-        story = [
-            f"On {fake.date_between(start_date='-1y', end_date='today').strftime('%B %d, %Y')}, ",
-            f"I experienced {random.choice(base_incidents[incident_type])} while ",
-            f"{random.choice(['traveling', 'working', 'at home', 'on vacation'])}. ",
-            
-            f"The incident occurred when {fake.sentence()} ",
-            
-            # Insert pattern-specific narrative elements
-            f"{random.choice(pattern['text_keywords']).capitalize()} has complicated matters because ",
-            f"{fake.sentence()}. ",
-            
-            # Add deliberate inconsistencies
-            " ".join([
-                f"Regarding the {inc[0]}, {inc[1]}. " 
-                for inc in selected_inconsistencies
-            ]),
-            
-            f"I immediately {random.choice([
-                'contacted authorities',
-                'took photos',
-                'sought medical attention',
-                'notified my insurance agent'
-            ])}, though {random.choice([
-                'there was some delay',
-                'the response was slow',
-                'documentation was incomplete'
-            ])}. ",
-            
-            f"Supporting documents include {random.choice([
-                'photographs',
-                'receipts',
-                'medical records',
-                'police reports'
-            ])}, but {random.choice([
-                'some are difficult to read',
-                'a few are missing dates',
-                'the originals were lost'
-            ])}. ",
-            
-            f"Additional context: {fake.paragraph(nb_sentences=3)} ",
-            
-            # Insert more pattern-specific content
-            f"{random.choice(pattern['text_keywords']).capitalize()} further complicates this because ",
-            f"{fake.sentence()}"
-        ]
+        fields.update({key: random.choice(options) for key, options in FRAUD_CHOICES.items()})
+        fields['keyword'] = random.choice(pattern['text_keywords']).capitalize()
+        fields['keyword2'] = random.choice(pattern['text_keywords']).capitalize()
+        fields['sentence3'] = fake_pick('sentence')
+        fields['inconsistencies'] = " ".join(
+            f"Regarding the {topic}, {detail}." for topic, detail in random.sample(INCONSISTENCIES, k=3)
+        )
+        text = FRAUD_CLAIM_TEMPLATE.format_map(fields)
     else:
-        incident_type = random.choice(list(base_incidents.keys()))
-        
-        story = [
-            f"On {fake.date_between(start_date='-1y', end_date='today').strftime('%B %d, %Y')}, ",
-            f"I experienced {random.choice(base_incidents[incident_type])} while ",
-            f"{random.choice(['driving to work', 'at home', 'traveling abroad', 'at the office'])}. ",
-            
-            f"The incident occurred at precisely {fake.time(pattern='%I:%M %p')} when ",
-            f"{fake.sentence()}. ",
-            
-            f"I immediately {random.choice([
-                'called 911',
-                'contacted my insurance agent',
-                'documented the scene with photos',
-                'sought medical attention'
-            ])} and {fake.sentence()}. ",
-            
-            f"Independent verification includes {random.choice([
-                'police report #' + fake.bothify(text='#######'),
-                'security footage from ' + fake.company(),
-                'witness statements from ' + fake.name(),
-                'medical records from ' + fake.company()
-            ])}. ",
-            
-            f"All documentation is complete and consistent, including ",
-            f"{random.choice([
-                'dated photographs',
-                'itemized receipts',
-                'signed witness statements',
-                'official reports'
-            ])}. ",
-            
-            f"Additional details: {fake.paragraph(nb_sentences=3)}"
-        ]
+        fields.update({key: random.choice(options) for key, options in LEGIT_CHOICES.items()})
+        fields['time'] = fake_pick('time')
+        prefix, kind = random.choice(VERIFICATION_SOURCES)
+        fields['verification'] = prefix + fake_pick(kind)
+        text = LEGIT_CLAIM_TEMPLATE.format_map(fields)
     
-    full_text = " ".join([s for s in story if s])
-    while len(full_text.split()) < 100:  # Ensure sufficient length
-        full_text += " " + fake.sentence()
+    # Ensure sufficient length, counting words as sentences are added rather than re-splitting
+    words = len(text.split())
+    padding = []
+    while words < MIN_CLAIM_WORDS:
+        sentence = fake_pick('sentence')
+        padding.append(sentence)
+        words += sentence.count(' ') + 1
     
-    return full_text.replace("  ", " ").strip()
+    return WHITESPACE_RE.sub(' ', " ".join([text, *padding])).strip()
 
-def generate_complex_claims(file_path: str, num_claims: int = 50):
-    """Generate claims optimized for advanced agent detection"""
+CLAIM_TYPES = ['Vehicle', 'Property', 'Health', 'Cyber', 'Travel']
+CLAIM_STATUSES = ['Pending', 'Under Review', 'Approved', 'Rejected']
+CLAIM_STATUS_WEIGHTS = [0.3, 0.4, 0.2, 0.1]
+DOC_KINDS = ['report', 'photos', 'statement']
+# Claims sheet layout by zero-based column index: widths from ClaimID on,
+# the wrapped ClaimText and Metadata columns, and the FraudFlag column
+CLAIMS_COLUMN_WIDTHS = (15, 20, 18, 12, 12, 80, 15, 15, 10, 25, 15, 30, 50, 12, 12)
+CLAIMS_WRAP_COLUMNS = (5, 12)
+CLAIMS_FRAUD_FLAG_COLUMN = 8
+CLAIMS_PER_CHUNK = 1000  # Claims per seeded chunk, and per worker process task
+
+EXCEL_HEADER_FORMAT = {'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'}  # DataFrame.to_excel's header style
+
+def excel_value(value):
+    """Cell value xlsxwriter accepts, stringifying lists and other objects like DataFrame.to_excel"""
+    return value if value is None or isinstance(value, (str, bool, int, float)) else str(value)
+
+def write_sheet_rows(worksheet, frame: pd.DataFrame, header_format):
+    """Write frame's header and rows top to bottom, blank cells for missing values"""
+    worksheet.write_row(0, 0, frame.columns.tolist(), header_format)
+    rows = frame.astype(object).where(frame.notna(), None).itertuples(index=False, name=None)
+    for row_num, row in enumerate(rows, start=1):
+        worksheet.write_row(row_num, 0, [excel_value(value) for value in row])
+
+@lru_cache(maxsize=1)
+def get_fraud_agents() -> AdvancedFraudAgents:
+    """One AdvancedFraudAgents per process, built the first time analysis is requested"""
+    return AdvancedFraudAgents()
+
+def _generate_claim_rows(num_claims: int, seed: np.random.SeedSequence, pool_seed: int) -> tuple:
+    """Build one chunk of claims and their metadata from its own seed"""
     
-    claims = []
-    fraud_agents = AdvancedFraudAgents()
+    rng = np.random.default_rng(seed)
+    # Pools are shared by every chunk of a batch, then each chunk reseeds random
+    # and Faker so worker processes draw independent streams
+    seed_faker_pools(pool_seed)
+    random_seed, faker_seed = seed.generate_state(2, np.uint64).tolist()
+    random.seed(random_seed)
+    fake.seed_instance(faker_seed)
+    patterns = FRAUD_PATTERN_VALUES
     
-    for _ in range(num_claims):
-        is_fraud = random.choices([True, False], weights=[0.35, 0.65])[0]
-        pattern = random.choice(list(FRAUD_PATTERNS.values())) if is_fraud else None
-        
-        metadata = generate_claim_metadata(is_fraud, pattern)
-        
-        claim_data = {
-            'ClaimID': f"CLM-{str(uuid.uuid4())[:8].upper()}",
-            'Claimant': fake.name(),
-            'PolicyNumber': f"POL-{random.randint(1000,9999)}-{random.randint(10,99)}",
-            'IncidentDate': fake.date_between(start_date='-1y', end_date='today').strftime('%Y-%m-%d'),
-            'ReportDate': (
-                fake.date_between(
-                    start_date=datetime.now() - timedelta(days=metadata.get('timing_anomalies', {}).get('report_delay_days', 0)),
-                    end_date='today'
-                ).strftime('%Y-%m-%d') 
-                if is_fraud 
-                else fake.date_between(start_date='-30d', end_date='today').strftime('%Y-%m-%d')),
-            'ClaimText': generate_detailed_claim_text(is_fraud, pattern),
-            'ClaimAmount': random.randint(*pattern['amount_range']) if is_fraud else random.randint(500, 15000),
-            'ClaimType': random.choice(['Vehicle', 'Property', 'Health', 'Cyber', 'Travel']),
-            'FraudFlag': is_fraud,
-            'FraudPattern': pattern['description'] if is_fraud else 'Legitimate',
-            'Status': random.choices(
-                ['Pending', 'Under Review', 'Approved', 'Rejected'],
-                weights=[0.3, 0.4, 0.2, 0.1]
-            )[0],
-            'SupportingDocs': ", ".join([
-                f"{fake.word()}_{random.choice(['report', 'photos', 'statement'])}_{random.randint(1,100)}.pdf"
-                for _ in range(random.randint(2, 5))
-            ]),
-            'Metadata': json.dumps(metadata, indent=2)
-        }
-        
-        # Create explicit connections for network analysis
-        if is_fraud and random.random() > 0.6:
-            related_claims = [f"CLM-{str(uuid.uuid4())[:8].upper()}" for _ in range(random.randint(1, 3))]
-            metadata['related_claims'] = related_claims
-            claim_data['RelatedClaims'] = ", ".join(related_claims)
-        
-        # Perform agent analysis (for demonstration, we'll simulate this)
-        if is_fraud:
-            metadata['agent_analysis'] = {
-                "simulated_analysis": True,
-                "potential_fraud_indicators": [
-                    {"type": k, "score": random.uniform(0.6, 0.95)} 
-                    for k in ['social', 'network', 'behavioral']
-                ]
-            }
-        
-        claims.append(claim_data)
+    # Scalar columns are drawn as whole arrays; only metadata and claim text are built per row
+    is_fraud = rng.random(num_claims) < 0.35
+    pattern_idx = rng.integers(0, len(patterns), num_claims)
+    row_patterns = [patterns[i] if fraud else None for i, fraud in zip(pattern_idx, is_fraud.tolist())]
+    metadata_list = [generate_claim_metadata(fraud, pattern, numeric)
+                     for fraud, pattern, numeric in zip(is_fraud.tolist(), row_patterns,
+                                                        sample_numeric_fields(rng, num_claims))]
+    
+    low = np.array([p['amount_range'][0] for p in patterns])
+    high = np.array([p['amount_range'][1] for p in patterns])
+    amounts = np.where(is_fraud,
+                       rng.integers(low[pattern_idx], high[pattern_idx] + 1),
+                       rng.integers(500, 15001, num_claims))
+    
+    # Dates are kept as int64 days-before-today; incidents within the last year, fraud
+    # reports within their report delay and others within 30 days
+    today = np.datetime64(datetime.now().date(), 'D')
+    incident_days_ago = rng.integers(0, 366, num_claims)
+    report_delay = np.array([m.get('timing_anomalies', {}).get('report_delay_days', 0) for m in metadata_list])
+    report_days_ago = rng.integers(0, np.where(is_fraud, report_delay, 30) + 1)
+    days_to_report = incident_days_ago - report_days_ago
+    
+    name_pool = np.array(faker_pool('name'), dtype=object)
     
-    df = pd.DataFrame(claims)
+    doc_counts = rng.integers(2, 6, num_claims)
+    total_docs = int(doc_counts.sum())
+    word_pool = faker_pool('word')
+    doc_names = [
+        f"{word_pool[w]}_{DOC_KINDS[k]}_{n}.pdf"
+        for w, k, n in zip(rng.integers(0, len(word_pool), total_docs).tolist(),
+                           rng.integers(0, len(DOC_KINDS), total_docs).tolist(),
+                           rng.integers(1, 101, total_docs).tolist())
+    ]
+    doc_ends = np.cumsum(doc_counts).tolist()
+    
+    claims = {
+        'ClaimID': [f"CLM-{v:08X}" for v in rng.integers(0, 1 << 32, num_claims).tolist()],
+        'Claimant': name_pool[rng.integers(0, len(name_pool), num_claims)],
+        'PolicyNumber': [f"POL-{a}-{b}" for a, b in zip(rng.integers(1000, 10000, num_claims).tolist(),
+                                                        rng.integers(10, 100, num_claims).tolist())],
+        'IncidentDate': np.datetime_as_string(today - incident_days_ago),
+        'ReportDate': np.datetime_as_string(today - report_days_ago),
+        'ClaimText': [generate_detailed_claim_text(fraud, pattern)
+                      for fraud, pattern in zip(is_fraud.tolist(), row_patterns)],
+        'ClaimAmount': amounts,
+        'ClaimType': rng.choice(CLAIM_TYPES, num_claims),
+        'FraudFlag': is_fraud,
+        'FraudPattern': [pattern['description'] if pattern else 'Legitimate' for pattern in row_patterns],
+        'Status': rng.choice(CLAIM_STATUSES, num_claims, p=CLAIM_STATUS_WEIGHTS),
+        'SupportingDocs': [", ".join(doc_names[end - count:end]) for end, count in zip(doc_ends, doc_counts.tolist())]
+    }
+    
+    # Create explicit connections for network analysis
+    related = is_fraud & (rng.random(num_claims) > 0.6)
+    claims['RelatedClaims'] = [
+        ", ".join(f"CLM-{v:08X}" for v in rng.integers(0, 1 << 32, rng.integers(1, 4)).tolist())
+        if linked else np.nan
+        for linked in related.tolist()
+    ]
     
     # Calculate derived fields
-    df['DaysToReport'] = (
-        pd.to_datetime(df['ReportDate']) - 
-        pd.to_datetime(df['IncidentDate'])
-    ).dt.days
-    df['AmountPerDay'] = df['ClaimAmount'] / df['DaysToReport'].clip(lower=1)
+    claims['DaysToReport'] = days_to_report
+    claims['AmountPerDay'] = amounts / np.clip(days_to_report, 1, None)
     
-    # Save to Excel with enhanced formatting
-    with pd.ExcelWriter(file_path, engine='openpyxl') as writer:
-        # Main claims sheet
-        df.to_excel(writer, sheet_name='Claims', index=False)
-        
-        # Create hidden metadata sheet for agents
-        metadata_df = pd.DataFrame([json.loads(m) for m in df['Metadata']])
-        metadata_df.insert(0, 'ClaimID', df['ClaimID'])
-        metadata_df.to_excel(writer, sheet_name='Metadata', index=False)
-        
-        # Formatting
-        workbook = writer.book
-        
-        # Hide metadata sheet
-        workbook['Metadata'].sheet_state = 'hidden'
-        
-        # Format main sheet
-        claims_sheet = writer.sheets['Claims']
+    return pd.DataFrame(claims), metadata_list
+
+def generate_complex_claims(file_path: str, num_claims: int = 50, seed: Optional[int] = None,
+                            run_agent_analysis: bool = False, json_sidecar_path: Optional[str] = None,
+                            workers: Optional[int] = None):
+    """Generate claims optimized for advanced agent detection"""
+    
+    # Claims are built in fixed-size chunks with independent seeds, so a seed gives the
+    # same data on any host; large batches map the chunks over worker processes and
+    # the Excel write below stays serial
+    chunk_sizes = [CLAIMS_PER_CHUNK] * (num_claims // CLAIMS_PER_CHUNK)
+    if num_claims % CLAIMS_PER_CHUNK or not chunk_sizes:
+        chunk_sizes.append(num_claims % CLAIMS_PER_CHUNK)
+    root_seed = np.random.SeedSequence(seed)
+    chunk_seeds = root_seed.spawn(len(chunk_sizes))
+    pool_seeds = [int(root_seed.generate_state(1, np.uint64)[0])] * len(chunk_sizes)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(chunk_sizes)))
+    if workers > 1:
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            chunks = list(executor.map(_generate_claim_rows, chunk_sizes, chunk_seeds, pool_seeds))
+    else:
+        chunks = list(map(_generate_claim_rows, chunk_sizes, chunk_seeds, pool_seeds))
+    df = pd.concat([chunk for chunk, _ in chunks], ignore_index=True)
+    metadata_list = [metadata for _, chunk_metadata in chunks for metadata in chunk_metadata]
+    if df['RelatedClaims'].isna().all():
+        df = df.drop(columns='RelatedClaims')
+    
+    # Optionally run the full agent pipeline on each claim's metadata (one LLM round per agent)
+    if run_agent_analysis:
+        fraud_agents = get_fraud_agents()
+        df['AgentAnalysis'] = [
+            orjson.dumps(fraud_agents.analyze_claim({'ClaimID': claim_id, **metadata}), default=str).decode()
+            for claim_id, metadata in zip(df['ClaimID'], metadata_list)
+        ]
+    
+    # Optional JSONL sidecar of each claim's metadata, streamed record by record
+    if json_sidecar_path:
+        with open(json_sidecar_path, 'wb', buffering=1 << 20) as sidecar:
+            sidecar.writelines(
+                orjson.dumps({'ClaimID': claim_id, **metadata}, option=orjson.OPT_APPEND_NEWLINE)
+                for claim_id, metadata in zip(df['ClaimID'], metadata_list)
+            )
+    
+    # Save to Excel with enhanced formatting; XlsxWriter streams the XML rather than building a DOM
+    # constant_memory flushes each row once the next starts, so both sheets are
+    # laid out first and their rows written strictly in order
+    with xlsxwriter.Workbook(file_path, {'constant_memory': True}) as workbook:
+        claims_sheet = workbook.add_worksheet('Claims')
+        metadata_sheet = workbook.add_worksheet('Metadata')
+        metadata_sheet.hide()
         
-        # Set column widths
-        col_widths = {
-            'A': 15, 'B': 20, 'C': 18, 'D': 12, 'E': 12,
-            'F': 80, 'G': 15, 'H': 15, 'I': 10, 'J': 25,
-            'K': 15, 'L': 30, 'M': 50, 'N': 12, 'O': 12
-        }
-        for col, width in col_widths.items():
-            claims_sheet.column_dimensions[col].width = width
+        # Set column widths, wrapping text for claim text and metadata
+        wrap_format = workbook.add_format({'text_wrap': True})
+        for col, width in enumerate(CLAIMS_COLUMN_WIDTHS):
+            claims_sheet.set_column(col, col, width, wrap_format if col in CLAIMS_WRAP_COLUMNS else None)
         
-        # Add conditional formatting for fraud
-        red_fill = PatternFill(start_color='FFC7CE', end_color='FFC7CE', fill_type='solid')
-        green_fill = PatternFill(start_color='C6EFCE', end_color='C6EFCE', fill_type='solid')
+        # Add conditional formatting for fraud: one rule per fill over the whole column
+        red_fill = workbook.add_format({'bg_color': '#FFC7CE'})
+        green_fill = workbook.add_format({'bg_color': '#C6EFCE'})
+        if num_claims:
+            fraud_range = (1, CLAIMS_FRAUD_FLAG_COLUMN, num_claims, CLAIMS_FRAUD_FLAG_COLUMN)
+            claims_sheet.conditional_format(*fraud_range, {'type': 'cell', 'criteria': '==', 'value': 'TRUE', 'format': red_fill})
+            claims_sheet.conditional_format(*fraud_range, {'type': 'cell', 'criteria': '!=', 'value': 'TRUE', 'format': green_fill})
         
-        for row in claims_sheet.iter_rows(min_row=2, max_row=claims_sheet.max_row, min_col=9, max_col=9):
-            for cell in row:
-                if cell.value == True:
-                    cell.fill = red_fill
-                else:
-                    cell.fill = green_fill
+        # Main claims sheet; its Metadata JSON column only exists for the duration of the write
+        header_format = workbook.add_format(EXCEL_HEADER_FORMAT)
+        df.insert(df.columns.get_loc('SupportingDocs') + 1, 'Metadata',
+                  [orjson.dumps(metadata).decode() for metadata in metadata_list])
+        try:
+            write_sheet_rows(claims_sheet, df, header_format)
+        finally:
+            df.pop('Metadata')
         
-        # Wrap text for claim text and metadata
-        for col in ['F', 'M']:
-            for row in claims_sheet.iter_rows(min_row=2, max_row=claims_sheet.max_row, min_col=ord(col)-64, max_col=ord(col)-64):
-                for cell in row:
-                    cell.alignment = openpyxl.styles.Alignment(wrap_text=True)
+        # Hidden metadata sheet for agents, one typed column per nested field;
+        # without max_level, json_normalize takes its much faster plain-dict path
+        metadata_df = pd.json_normalize(metadata_list)
+        metadata_df.insert(0, 'ClaimID', df['ClaimID'])
+        write_sheet_rows(metadata_sheet, metadata_df, header_format)
     
     print(f"\nGenerated {num_claims} advanced claims at: {file_path}")
     print(f"Fraudulent claims: {sum(df['FraudFlag'])}")
@@ -664,4 +915,5 @@ def generate_complex_claims(file_path: str, num_claims: int = 50):
 
 # Generate the enhanced claims file with agent analysis capabilities
 if __name__ == "__main__":
-    claims_data = generate_complex_claims("advanced_fraud_claims_with_agents.xlsx", num_claims=2)
\ No newline at end of file
+    claims_data = generate_complex_claims("advanced_fraud_claims_with_agents.xlsx", num_claims=2,
+                                          json_sidecar_path="advanced_fraud_claims_with_agents.jsonl")
\ No newline at end of file
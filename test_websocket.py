@@ -1,61 +1,33 @@
 #!/usr/bin/env python3
 import asyncio
-import websockets
-import json
-import requests
+import httpx
 import sys
-import time
+import uuid
 
-async def monitor_websocket(task_id):
-    """Monitor WebSocket updates for a given task ID"""
-    try:
-        uri = f'ws://localhost:8000/ws/{task_id}'
-        print(f"🔌 Connecting to WebSocket: {uri}")
-        
-        async with websockets.connect(uri) as websocket:
-            print("✅ WebSocket connected successfully!")
-            
-            while True:
-                try:
-                    message = await asyncio.wait_for(websocket.recv(), timeout=60.0)
-                    data = json.loads(message)
-                    
-                    # Pretty print the update
-                    if data['type'] == 'connection_established':
-                        print(f"🟢 {data['message']}")
-                    elif data['type'] == 'progress':
-                        progress = data.get('progress', 0)
-                        message = data.get('message', 'Processing...')
-                        print(f"⏳ [{progress:3d}%] {message}")
-                    elif data['type'] == 'completed':
-                        print(f"🎉 {data['message']}")
-                        if 'processing_time' in data:
-                            print(f"   Processing time: {data['processing_time']}")
-                        break
-                    elif data['type'] == 'error':
-                        print(f"❌ Error: {data['error']}")
-                        break
-                    else:
-                        print(f"📨 {data}")
-                        
-                except asyncio.TimeoutError:
-                    print("⏰ WebSocket timeout - no updates received")
-                    break
-                except websockets.exceptions.ConnectionClosed:
-                    print("🔌 WebSocket connection closed")
-                    break
-                    
-    except Exception as e:
-        print(f"❌ WebSocket error: {e}")
+from ws_client import monitor_task, run
 
-def upload_file_and_get_task_id(file_path):
-    """Upload file and return task ID"""
+UPLOAD_URL = 'http://localhost:8000/api/upload-excel'
+OUTPUT_FLUSH_INTERVAL = 0.05
+
+# Keep-alive pool shared by every upload through one AsyncClient
+HTTP_LIMITS = httpx.Limits(max_connections=8, max_keepalive_connections=4)
+
+async def flush_output():
+    """Flush block-buffered stdout every OUTPUT_FLUSH_INTERVAL rather than once per printed update"""
+    while True:
+        await asyncio.sleep(OUTPUT_FLUSH_INTERVAL)
+        sys.stdout.flush()
+
+async def upload_file_and_get_task_id(client: httpx.AsyncClient, file_path, task_id=None):
+    """Upload file and return task ID, asking the server to use task_id when given"""
     try:
         print(f"📤 Uploading file: {file_path}")
         
         with open(file_path, 'rb') as f:
+            # httpx streams file fields from disk in chunks rather than buffering the body
             files = {'file': ('sample_claims.xlsx', f, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')}
-            response = requests.post('http://localhost:8000/api/upload-excel', files=files)
+            headers = {'X-Task-ID': task_id} if task_id else None
+            response = await client.post(UPLOAD_URL, files=files, headers=headers)
         
         if response.status_code == 200:
             data = response.json()
@@ -70,25 +42,45 @@ def upload_file_and_get_task_id(file_path):
         print(f"❌ Upload error: {e}")
         return None
 
-async def main():
+async def run_batch_test():
     print("🚀 Testing WebSocket Real-time Batch Processing")
     print("=" * 50)
     
-    # Upload file
+    # Choose the task ID up front so the WebSocket handshake overlaps the upload
     file_path = "/tmp/sample_claims_test.xlsx"
-    task_id = upload_file_and_get_task_id(file_path)
+    task_id = uuid.uuid4().hex
+    print(f"\n🔍 Monitoring task: {task_id}")
+    print("=" * 50)
+    monitor = asyncio.create_task(monitor_task(task_id))
     
-    if not task_id:
+    async with httpx.AsyncClient(limits=HTTP_LIMITS, timeout=60.0) as client:
+        uploaded_task_id = await upload_file_and_get_task_id(client, file_path, task_id)
+    
+    if not uploaded_task_id:
+        monitor.cancel()
         print("❌ Failed to upload file. Exiting.")
-        return
+        return False
     
-    print(f"\n🔍 Monitoring task: {task_id}")
-    print("=" * 50)
+    if uploaded_task_id != task_id:
+        # Server ignored X-Task-ID; follow the task it created instead
+        monitor.cancel()
+        monitor = asyncio.create_task(monitor_task(uploaded_task_id))
     
     # Monitor WebSocket updates
-    await monitor_websocket(task_id)
+    finished = await monitor
     
     print("\n✨ Test completed!")
+    return finished
+
+async def main():
+    flusher = asyncio.create_task(flush_output())
+    try:
+        return await run_batch_test()
+    finally:
+        flusher.cancel()
+        sys.stdout.flush()
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    # Updates are flushed by flush_output instead of a write per line on a terminal
+    sys.stdout.reconfigure(line_buffering=False)
+    sys.exit(0 if run(main()) else 1)
@@ -1,35 +1,16 @@
 #!/usr/bin/env python3
-import asyncio
-import websockets
-import json
 import sys
 
+from ws_client import main_many, monitor_task
+
 async def test_websocket(task_id):
-    """Simple WebSocket test"""
-    try:
-        uri = f'ws://localhost:8000/ws/{task_id}'
-        print(f"Connecting to: {uri}")
-        
-        async with websockets.connect(uri) as websocket:
-            print("✅ Connected!")
-            
-            # Wait for initial message
-            try:
-                message = await asyncio.wait_for(websocket.recv(), timeout=5.0)
-                data = json.loads(message)
-                print(f"📨 Received: {data}")
-            except asyncio.TimeoutError:
-                print("⏰ No initial message received (this is normal if task completed)")
-            except Exception as e:
-                print(f"❌ Error receiving message: {e}")
-                
-    except Exception as e:
-        print(f"❌ Connection error: {e}")
+    """Simple WebSocket test: print the first frame the server sends for a task"""
+    return await monitor_task(task_id, once=True)
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python3 test_ws_simple.py <task_id>")
+    if len(sys.argv) < 2:
+        print("Usage: python3 test_ws_simple.py <task_id> [<task_id> ...]")
         sys.exit(1)
     
-    task_id = sys.argv[1]
-    asyncio.run(test_websocket(task_id))
+    # Every task ID is checked concurrently on a single event loop
+    sys.exit(0 if main_many(sys.argv[1:], once=True) else 1)
@@ -0,0 +1,207 @@
+"""Shared WebSocket client for the batch progress test scripts"""
+import asyncio
+import websockets
+import orjson
+import random
+import sys
+from typing import Optional
+
+try:
+    import uvloop  # Ships with uvicorn[standard] except on Windows
+except ImportError:
+    uvloop = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import picows
+except ImportError:
+    picows = None
+
+WS_URL = 'ws://localhost:8000/ws/{task_id}'
+# Binary frames skip the UTF-8 validation websockets runs on every text frame;
+# msgpack is preferred and binary JSON is the fallback
+SUBPROTOCOLS = ["msgpack", "json-binary"] if msgpack is not None else ["json-binary"]
+# Progress frames are small; batches of up to 32 updates stay well under max_size.
+# Deflate is off since its per-connection zlib state outweighs any saving on them
+CONNECT_OPTIONS = {'max_size': 2 ** 16, 'max_queue': 16, 'write_limit': 2 ** 14, 'compression': None}
+RECV_TIMEOUT = 60.0  # Seconds without an update before giving up on the task
+ONCE_TIMEOUT = 5.0  # Seconds to wait for the first frame when only one is wanted
+MAX_RECONNECTS = 5
+RECONNECT_DELAY = 0.5  # First backoff in seconds, doubled per attempt up to RECONNECT_MAX_DELAY
+RECONNECT_MAX_DELAY = 10.0
+
+def run(main):
+    """Run a coroutine on uvloop when available, otherwise asyncio's default loop"""
+    return (uvloop.run if uvloop is not None else asyncio.run)(main, debug=False)
+
+def decode_message(message, subprotocol=None):
+    """msgpack frames are unpacked; binary and text JSON frames go straight to orjson"""
+    if subprotocol == "msgpack":
+        return msgpack.unpackb(message)
+    return orjson.loads(message)
+
+# Update printers by message type; each returns True once the task completed,
+# False once it failed and None while it is still running
+def _print_connected(data) -> Optional[bool]:
+    print(f"🟢 {data['message']}")
+
+_PROGRESS_LINE = "⏳ [%3d%%] %s".__mod__  # Bound once; progress is the per-frame hot path
+
+def _print_progress(data) -> Optional[bool]:
+    print(_PROGRESS_LINE((data.get('progress', 0), data.get('message', 'Processing...'))))
+
+def _print_completed(data) -> Optional[bool]:
+    print(f"🎉 {data['message']}")
+    if 'processing_time' in data:
+        print(f"   Processing time: {data['processing_time']}")
+    sys.stdout.flush()
+    return True
+
+def _print_error(data) -> Optional[bool]:
+    print(f"❌ Error: {data['error']}", flush=True)
+    return False
+
+def _print_other(data) -> Optional[bool]:
+    print(f"📨 {data}")
+
+UPDATE_PRINTERS = {
+    'connection_established': _print_connected,
+    'progress': _print_progress,
+    'completed': _print_completed,
+    'error': _print_error
+}
+
+def print_update(data) -> Optional[bool]:
+    """Pretty print one update, returning the task's outcome once it has one"""
+    return UPDATE_PRINTERS.get(data.get('type'), _print_other)(data)
+
+def print_frame(data) -> Optional[bool]:
+    """Print every update in a decoded frame, up to the one that ends the task"""
+    # Updates sent close together arrive as one array frame
+    for update in data if isinstance(data, list) else [data]:
+        outcome = print_update(update)
+        if outcome is not None:
+            return outcome
+    return None
+
+def _print_timeout(once: bool):
+    if once:
+        print("⏰ No initial message received (this is normal if task completed)")
+    else:
+        print("⏰ WebSocket timeout - no updates received")
+
+if picows is not None:
+    class ProgressListener(picows.WSListener):
+        """Print updates as picows hands over parsed frames, closing once the task finishes"""
+
+        def __init__(self, once: bool = False):
+            self.once = once
+            self.subprotocol = None
+            self.timeout = None
+            self.finished = False
+            self.closing = False  # Set once this side ends the connection
+
+        def on_ws_connected(self, transport: picows.WSTransport):
+            self.subprotocol = transport.response.headers.get('Sec-WebSocket-Protocol')
+            print("✅ WebSocket connected successfully!")
+
+        def on_ws_frame(self, transport: picows.WSTransport, frame: picows.WSFrame):
+            if self.closing:
+                return  # Frames already read in the same chunk as the last one wanted
+            if frame.msg_type == picows.WSMsgType.CLOSE:
+                transport.send_close(frame.get_close_code())
+                transport.disconnect()
+                return
+            if frame.msg_type not in (picows.WSMsgType.TEXT, picows.WSMsgType.BINARY):
+                return
+            if self.timeout is not None:
+                self.timeout.reschedule(asyncio.get_running_loop().time() + RECV_TIMEOUT)
+            outcome = print_frame(decode_message(frame.get_payload_as_bytes(), self.subprotocol))
+            if outcome is not None or self.once:
+                self.finished = outcome is not False
+                self.closing = True
+                transport.send_close(picows.WSCloseCode.OK)
+                transport.disconnect()
+
+        def on_ws_disconnected(self, transport: picows.WSTransport):
+            if not self.closing:
+                print("🔌 WebSocket connection closed")
+
+# Per-connection monitors return True once done, False on failure or giving up, None when the connection dropped
+async def _monitor_picows(uri: str, once: bool) -> Optional[bool]:
+    transport, listener = await picows.ws_connect(
+        lambda: ProgressListener(once), uri,
+        extra_headers={'Sec-WebSocket-Protocol': ', '.join(SUBPROTOCOLS)},
+        max_frame_size=CONNECT_OPTIONS['max_size']
+    )
+    try:
+        async with asyncio.timeout(ONCE_TIMEOUT if once else RECV_TIMEOUT) as listener.timeout:
+            await transport.wait_disconnected()
+    except TimeoutError:
+        _print_timeout(once)
+        listener.closing = True
+        transport.disconnect()
+    return listener.finished if listener.closing else None
+
+async def _monitor_websockets(uri: str, once: bool) -> Optional[bool]:
+    async with websockets.connect(uri, subprotocols=SUBPROTOCOLS, **CONNECT_OPTIONS) as websocket:
+        print("✅ WebSocket connected successfully!")
+
+        loop = asyncio.get_running_loop()
+        try:
+            # One deadline pushed back per frame rather than a wait_for task per recv
+            async with asyncio.timeout(ONCE_TIMEOUT if once else RECV_TIMEOUT) as timeout:
+                while True:
+                    message = await websocket.recv()
+                    timeout.reschedule(loop.time() + RECV_TIMEOUT)
+                    outcome = print_frame(decode_message(message, websocket.subprotocol))
+                    if outcome is not None or once:
+                        return outcome is not False
+
+        except TimeoutError:
+            _print_timeout(once)
+            return False
+        except websockets.exceptions.ConnectionClosed:
+            print("🔌 WebSocket connection closed")
+            return None
+
+async def monitor_task(task_id: str, *, once: bool = False) -> bool:
+    """Print a task's WebSocket updates until it finishes, or only the first frame when once
+
+    Dropped or refused connections are retried up to MAX_RECONNECTS times with
+    jittered exponential backoff; the server replays the task's current status
+    on every connect. Returns True when the task completed (or, with once, a frame
+    other than an error arrived) and False when it failed or monitoring gave up.
+    """
+    uri = WS_URL.format(task_id=task_id)
+    # picows parses frames in native code; websockets is the pure-Python fallback
+    monitor = _monitor_picows if picows is not None else _monitor_websockets
+    for attempt in range(MAX_RECONNECTS + 1):
+        if attempt:
+            delay = min(RECONNECT_DELAY * 2 ** (attempt - 1), RECONNECT_MAX_DELAY) * random.uniform(0.5, 1.0)
+            print(f"🔄 Reconnecting in {delay:.1f}s ({attempt}/{MAX_RECONNECTS})")
+            await asyncio.sleep(delay)
+        try:
+            print(f"🔌 Connecting to WebSocket: {uri}")
+            result = await monitor(uri, once)
+        except OSError as e:
+            print(f"❌ WebSocket error: {e}")
+            continue
+        except Exception as e:
+            print(f"❌ WebSocket error: {e}")
+            return False
+        if result is not None:
+            return result
+    return False
+
+async def monitor_tasks(task_ids, *, once: bool = False) -> bool:
+    """Monitor several tasks concurrently, returning True only if every one finished"""
+    return all(await asyncio.gather(*(monitor_task(task_id, once=once) for task_id in task_ids)))
+
+def main_many(task_ids, *, once: bool = False) -> bool:
+    """Monitor many tasks on one event loop rather than one asyncio.run per task"""
+    return run(monitor_tasks(task_ids, once=once))